@@ -6,6 +6,10 @@ Usa el album_id o track_id que Bandcamp ya proporciona
 
 import re
 
+# album=XXXX o track=XXXX. En las URLs de EmbeddedPlayer album= siempre va
+# antes que track=, así que la primera coincidencia es la que buscamos.
+_BC_ID_RE = re.compile(r'(?P<kind>album|track)=(?P<id>\d+)')
+
 
 def extract_bandcamp_id(embed_code):
     """
@@ -30,15 +34,10 @@ def extract_bandcamp_id(embed_code):
     if not embed_code:
         return None
 
-    # Buscar album=XXXXXXXX en el embed
-    album_match = re.search(r'album=(\d+)', embed_code)
-    if album_match:
-        return f"album_{album_match.group(1)}"
-
-    # Buscar track=XXXXXXXX en el embed
-    track_match = re.search(r'track=(\d+)', embed_code)
-    if track_match:
-        return f"track_{track_match.group(1)}"
+    # Buscar album=XXXXXXXX o track=XXXXXXXX en una sola pasada
+    match = _BC_ID_RE.search(embed_code)
+    if match:
+        return f"{match.group('kind')}_{match.group('id')}"
 
     return None
 
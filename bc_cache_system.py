@@ -7,107 +7,455 @@ Soporta múltiples cuentas, carpetas, estados (leído/no leído)
 
 import json
 import os
+import time
+import sqlite3
 import hashlib
-from datetime import datetime
+from collections import OrderedDict
+from operator import itemgetter
+from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    # Opcional: parseo/serialización en C, bastante más rápido que json
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_default(obj):
+    """Serializa los datetime de las entradas (p.ej. date_obj) como ISO"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+def _dumps(obj):
+    """Serializa a texto JSON compacto (con orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default).decode('utf-8')
+    # Sin espacios tras ',' y ':', igual que orjson: nadie lee esto a mano
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
+
+def _loads(data):
+    """Parsea JSON desde str o bytes (con orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _read_json_file(path):
+    """Lee un archivo JSON completo de una vez"""
+    with open(path, 'rb') as f:
+        return _loads(f.read())
+
+
+# Fecha para correos sin fecha legible: siempre hay un date_obj comparable
+MIN_DATE = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def normalize_date(date_obj):
+    """Fecha con zona horaria (UTC si no la tiene) o MIN_DATE si no hay fecha"""
+    if date_obj is None:
+        return MIN_DATE
+    if date_obj.tzinfo is None:
+        return date_obj.replace(tzinfo=timezone.utc)
+    return date_obj
+
+
+def sort_by_date(embeds):
+    """
+    Ordena los embeds por fecha, más reciente primero.
+    Todo embed tiene date_obj (MIN_DATE si no hay fecha), así que la clave es
+    un itemgetter en C; reverse=True mantiene el orden original en empates.
+    """
+    embeds.sort(key=itemgetter('date_obj'), reverse=True)
+
+
+def _restore_entry(entry):
+    """Recupera date_obj como datetime al leer una entrada de disco"""
+    date_obj = entry.get('date_obj')
+    if isinstance(date_obj, str):
+        try:
+            date_obj = datetime.fromisoformat(date_obj)
+        except ValueError:
+            date_obj = None
+    entry['date_obj'] = normalize_date(date_obj)
+    return entry
+
+
+DEFAULT_DB_FILE = '.bandcamp_cache.db'
+
+# Marca de las entradas de correos descartados (caché negativo)
+MISS_KEY = '__miss__'
+
+# Memoria LRU delante de SQLite: entradas como máximo y segundos de validez
+DEFAULT_MEMORY_ITEMS = 10000
+DEFAULT_MEMORY_TTL = 3600
+
+
+def _connect(db_file):
+    """
+    Abre la base de datos SQLite en modo autocommit con WAL.
+    WAL + synchronous=NORMAL hace que cada INSERT cueste O(1) en disco
+    sin bloquear a otros lectores.
+    """
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def _table_exists(conn, table):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def _iso_to_epoch(value):
+    """Convierte un timestamp ISO antiguo a epoch (o ahora si no es válido)"""
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time())
+
+
+def _split_key(key):
+    """Separa una clave antigua "server:email:folder:message_id" en tupla"""
+    parts = key.split(':', 3)
+    return tuple(parts + [''] * (4 - len(parts)))
+
 
 class EmailCache:
     """
     Gestiona un caché de correos procesados para evitar descargas duplicadas.
 
-    Estructura del caché:
-    {
-        "server:email:folder:message_id": {
-            "url": "https://...",
-            "subject": "...",
-            "date": "...",
-            "embed": "...",
-            "processed_at": "2024-11-04T12:00:00",
-            "was_read": false,
-            "genre": "Rock"
-        }
+    Persistencia en SQLite (tabla "cache"): cada add() es un INSERT y
+    add_many() una sola transacción, sin reescribir el resto del caché.
+    Si existe un caché JSON antiguo (.bandcamp_cache.json y su .log) se
+    importa al crear la tabla.
+
+    La tabla "folders" guarda, por carpeta, el UIDVALIDITY/HIGHESTMODSEQ
+    (CONDSTORE) de la última sincronización completa y los Message-ID que
+    dio, para no volver a recorrer una carpeta que no ha cambiado; y el
+    mayor UID visto y cuántos correos había, para pedir después al servidor
+    solo los UIDs nuevos.
+
+    Estructura de una entrada:
+    (server, email, folder, message_id) -> {
+        "url": "https://...",
+        "subject": "...",
+        "date": "...",
+        "embed": "...",
+        "was_read": false,
+        "genre": "Rock"
     }
+    La fecha de procesamiento va aparte, en la columna processed_at (epoch).
+    Los correos descartados (sin enlace o sin embed) se guardan como
+    {MISS_KEY: True, "reason": "..."} para no volver a descargarlos.
+
+    Delante de SQLite hay una memoria LRU acotada (memory_items entradas,
+    cada una válida memory_ttl segundos); add() escribe en las dos.
     """
 
-    def __init__(self, cache_file='.bandcamp_cache.json'):
-        self.cache_file = cache_file
-        self.cache = self._load_cache()
+    def __init__(self, cache_file=DEFAULT_DB_FILE, memory_items=DEFAULT_MEMORY_ITEMS,
+                 memory_ttl=DEFAULT_MEMORY_TTL):
+        self.memory_items = memory_items
+        self.memory_ttl = memory_ttl
+        self._memory = OrderedDict()
+
+        legacy_file = None
+        if cache_file != ':memory:':
+            if cache_file.endswith('.json'):
+                # Ruta antigua: migrar a la base de datos junto a ella
+                legacy_file = cache_file
+                cache_file = str(Path(cache_file).with_suffix('.db'))
+            else:
+                legacy_file = str(Path(cache_file).with_suffix('.json'))
 
-    def _load_cache(self):
-        """Carga el caché desde disco"""
-        if os.path.exists(self.cache_file):
+        self.cache_file = cache_file
+        self.conn = _connect(cache_file)
+
+        if not _table_exists(self.conn, 'cache'):
+            self._create_table()
+            if legacy_file:
+                self._import_legacy(legacy_file)
+        elif 'server' not in self._columns():
+            self._upgrade_text_keys()
+
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS folders ('
+            ' server TEXT NOT NULL,'
+            ' email TEXT NOT NULL,'
+            ' folder TEXT NOT NULL,'
+            ' uidvalidity INTEGER NOT NULL,'
+            ' highestmodseq INTEGER NOT NULL,'
+            ' criteria TEXT NOT NULL,'
+            ' message_ids TEXT NOT NULL,'
+            ' max_uid INTEGER NOT NULL DEFAULT 0,'
+            ' uid_count INTEGER NOT NULL DEFAULT 0,'
+            ' PRIMARY KEY (server, email, folder))'
+        )
+        folder_columns = [row[1] for row in self.conn.execute('PRAGMA table_info(folders)')]
+        for column in ('max_uid', 'uid_count'):
+            if column not in folder_columns:
+                self.conn.execute(
+                    f'ALTER TABLE folders ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'
+                )
+
+    def _create_table(self):
+        self.conn.execute(
+            'CREATE TABLE cache ('
+            ' server TEXT NOT NULL,'
+            ' email TEXT NOT NULL,'
+            ' folder TEXT NOT NULL,'
+            ' message_id TEXT NOT NULL,'
+            ' entry TEXT NOT NULL,'
+            ' processed_at INTEGER NOT NULL,'
+            ' PRIMARY KEY (server, email, folder, message_id))'
+        )
+        self.conn.execute('CREATE INDEX cache_processed_at ON cache(processed_at)')
+
+    def _columns(self):
+        return [row[1] for row in self.conn.execute('PRAGMA table_info(cache)')]
+
+    def _upgrade_text_keys(self):
+        """Convierte una tabla con claves "server:email:folder:id" a columnas"""
+        rows = [(_split_key(key), entry, processed_at) for key, entry, processed_at
+                in self.conn.execute('SELECT key, entry, processed_at FROM cache')]
+        self.conn.execute('BEGIN')
+        self.conn.execute('DROP TABLE cache')
+        self._create_table()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)',
+            (key + (entry, processed_at) for key, entry, processed_at in rows)
+        )
+        self.conn.execute('COMMIT')
+
+    def _import_legacy(self, legacy_file):
+        """Importa el caché JSON antiguo (snapshot + log append-only)"""
+        entries = {}
+        if os.path.exists(legacy_file):
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                entries = _read_json_file(legacy_file)
             except (json.JSONDecodeError, IOError):
-                print(f"⚠️  Error al leer caché, creando nuevo")
-                return {}
-        return {}
+                print(f"⚠️  Error al leer caché antiguo {legacy_file}, se ignora")
+
+        log_file = str(Path(legacy_file).with_suffix('.log'))
+        if os.path.exists(log_file):
+            try:
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = _loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        entries[record['k']] = record['v']
+            except IOError:
+                print(f"⚠️  Error al leer log del caché antiguo")
+
+        if entries:
+            rows = []
+            for key, entry in entries.items():
+                # processed_at ISO se parsea una sola vez, aquí
+                processed_at = _iso_to_epoch(entry.pop('processed_at', None))
+                rows.append(_split_key(key) + (_dumps(entry), processed_at))
+
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self.conn.execute('COMMIT')
+            print(f"📦 Migradas {len(entries)} entradas del caché JSON a {self.cache_file}")
 
     def save(self):
-        """Guarda el caché a disco"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, indent=2, ensure_ascii=False)
-        except IOError as e:
-            print(f"⚠️  Error al guardar caché: {e}")
+        """
+        No hace nada: la conexión está en autocommit y cada escritura ya se
+        confirma al momento (las de varias filas en su propia transacción).
+        Se mantiene por compatibilidad con quien lo llama al terminar.
+        """
+
+    def close(self):
+        """Cierra la base de datos"""
+        self.conn.close()
+
+    def clear(self):
+        """Elimina todas las entradas del caché"""
+        self._memory.clear()
+        self.conn.execute('DELETE FROM cache')
+        self.conn.execute('DELETE FROM folders')
+
+    def _remember(self, key, entry):
+        """Guarda una entrada en la memoria LRU, expulsando la más antigua si no cabe"""
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = (time.monotonic() + self.memory_ttl, entry)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _recall(self, key):
+        """Entrada de la memoria LRU, o None si no está o ha caducado"""
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        expires, entry = item
+        if expires < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry
 
     def _make_key(self, server, email, folder, message_id):
-        """Genera una clave única para un correo"""
-        return f"{server}:{email}:{folder}:{message_id}"
+        """Genera una clave única para un correo (tupla, sin formatear strings)"""
+        return (server, email, folder, message_id)
 
     def has(self, server, email, folder, message_id):
         """Verifica si un correo ya está en caché"""
         key = self._make_key(server, email, folder, message_id)
-        return key in self.cache
+        if self._recall(key) is not None:
+            return True
+        row = self.conn.execute(
+            'SELECT 1 FROM cache'
+            ' WHERE server = ? AND email = ? AND folder = ? AND message_id = ? LIMIT 1',
+            key
+        ).fetchone()
+        return row is not None
 
     def get(self, server, email, folder, message_id):
         """Obtiene un correo del caché"""
+        return self.lookup(server, email, folder, message_id)[1]
+
+    def lookup(self, server, email, folder, message_id):
+        """
+        Busca un correo con una sola consulta.
+        Devuelve (clave, entrada) con entrada = None si no está en caché;
+        la clave sirve después para add_by_key().
+        """
         key = self._make_key(server, email, folder, message_id)
-        return self.cache.get(key)
+        entry = self._recall(key)
+        if entry is not None:
+            return key, entry
+
+        row = self.conn.execute(
+            'SELECT entry FROM cache'
+            ' WHERE server = ? AND email = ? AND folder = ? AND message_id = ?',
+            key
+        ).fetchone()
+        if row is None:
+            return key, None
+
+        entry = _restore_entry(_loads(row[0]))
+        self._remember(key, entry)
+        return key, entry
 
     def add(self, server, email, folder, message_id, embed_data):
         """Añade un correo al caché"""
-        key = self._make_key(server, email, folder, message_id)
-
-        # Añadir timestamp de procesamiento
-        cache_entry = embed_data.copy()
-        cache_entry['processed_at'] = datetime.now().isoformat()
-        cache_entry['cache_key'] = key
+        self.add_by_key(self._make_key(server, email, folder, message_id), embed_data)
+
+    def _row(self, key, embed_data, processed_at):
+        """Fila de la tabla cache para una entrada (y la guarda en memoria)"""
+        # Una sola construcción del dict; el embed del llamador no se modifica
+        cache_entry = {**embed_data, 'cache_key': ':'.join(key)}
+        self._remember(key, cache_entry)
+
+        # El timestamp de procesamiento solo se guarda como epoch en su columna
+        return key + (_dumps(cache_entry), processed_at)
+
+    def add_by_key(self, key, embed_data):
+        """Añade un correo al caché con una clave devuelta por lookup()"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)',
+            self._row(key, embed_data, int(time.time()))
+        )
+
+    def add_many(self, items):
+        """
+        Añade varios correos en una sola transacción.
+        items: pares (clave devuelta por lookup(), embed_data)
+        """
+        now = int(time.time())
+        rows = [self._row(key, embed_data, now) for key, embed_data in items]
+        if not rows:
+            return
+
+        self.conn.execute('BEGIN')
+        self.conn.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.conn.execute('COMMIT')
+
+    def get_many(self, server, email, folder, message_ids):
+        """Entradas de una carpeta para varios Message-ID (las que existan)"""
+        wanted = set(message_ids)
+        return [
+            _restore_entry(_loads(entry)) for message_id, entry in self.conn.execute(
+                'SELECT message_id, entry FROM cache'
+                ' WHERE server = ? AND email = ? AND folder = ?',
+                (server, email, folder)
+            )
+            if message_id in wanted
+        ]
+
+    def get_folder_state(self, server, email, folder):
+        """Estado de la última sincronización completa de una carpeta (o None)"""
+        row = self.conn.execute(
+            'SELECT uidvalidity, highestmodseq, criteria, message_ids, max_uid, uid_count'
+            ' FROM folders'
+            ' WHERE server = ? AND email = ? AND folder = ?',
+            (server, email, folder)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'uidvalidity': row[0],
+            'highestmodseq': row[1],
+            'criteria': row[2],
+            'message_ids': _loads(row[3]),
+            'max_uid': row[4],
+            'uid_count': row[5]
+        }
 
-        self.cache[key] = cache_entry
+    def set_folder_state(self, server, email, folder, uidvalidity, highestmodseq,
+                         criteria, message_ids, max_uid=0, uid_count=0):
+        """
+        Guarda el estado de una carpeta tras una sincronización completa.
+        highestmodseq es 0 si el servidor no soporta CONDSTORE.
+        """
+        self.conn.execute(
+            'INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (server, email, folder, uidvalidity, highestmodseq, criteria,
+             _dumps(list(message_ids)), max_uid, uid_count)
+        )
 
     def get_stats(self):
         """Obtiene estadísticas del caché"""
+        total, servers, accounts, folders, misses = self.conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT server),'
+            ' (SELECT COUNT(*) FROM (SELECT DISTINCT server, email FROM cache)),'
+            ' (SELECT COUNT(*) FROM (SELECT DISTINCT server, email, folder FROM cache)),'
+            # Por clave JSON y no por texto: no depende del orden de las
+            # claves ni de los separadores del serializador
+            ' SUM(json_extract(entry, ?) IS NOT NULL)'
+            ' FROM cache',
+            ('$."%s"' % MISS_KEY,)
+        ).fetchone()
         return {
-            'total_emails': len(self.cache),
-            'servers': len(set(k.split(':')[0] for k in self.cache.keys())),
-            'accounts': len(set(':'.join(k.split(':')[:2]) for k in self.cache.keys())),
-            'folders': len(set(':'.join(k.split(':')[:3]) for k in self.cache.keys()))
+            'total_emails': total,
+            'misses': misses or 0,
+            'servers': servers,
+            'accounts': accounts,
+            'folders': folders
         }
 
     def clean_old_entries(self, days=90):
         """Limpia entradas antiguas del caché"""
-        cutoff = datetime.now().timestamp() - (days * 24 * 60 * 60)
-        removed = 0
-
-        keys_to_remove = []
-        for key, entry in self.cache.items():
-            if 'processed_at' in entry:
-                try:
-                    entry_time = datetime.fromisoformat(entry['processed_at']).timestamp()
-                    if entry_time < cutoff:
-                        keys_to_remove.append(key)
-                except:
-                    pass
-
-        for key in keys_to_remove:
-            del self.cache[key]
-            removed += 1
+        cutoff = int(time.time() - (days * 24 * 60 * 60))
+        removed = self.conn.execute(
+            'DELETE FROM cache WHERE processed_at < ?', (cutoff,)
+        ).rowcount
 
         if removed > 0:
-            self.save()
+            # Las carpetas guardadas podrían apuntar a entradas borradas
+            self._memory.clear()
+            self.conn.execute('DELETE FROM folders')
             print(f"🗑️  Limpiadas {removed} entradas antiguas del caché")
 
         return removed
@@ -120,86 +468,132 @@ class SyncTracker:
     - Álbumes que nunca existieron en la colección
     - Álbumes que existieron pero el usuario los eliminó (escuchó)
 
-    Estructura:
-    {
-        "genre": {
-            "embed_id": {
-                "url": "...",
-                "added_at": "2024-11-04T12:00:00",
-                "removed_at": "2024-11-05T15:30:00",  # Si fue eliminado
-                "status": "active"|"removed"
-            }
-        }
-    }
+    Persistencia en SQLite (tabla "sync", en la misma base de datos que el
+    caché). Si existe .bandcamp_sync_tracker.json se importa al crear la tabla.
+
+    Estructura de una fila:
+    (genre, embed_id) -> url, added_at, removed_at (si fue eliminado),
+                         status "active"|"removed"
+    Los timestamps se guardan como epoch (segundos).
     """
 
-    def __init__(self, tracker_file='.bandcamp_sync_tracker.json'):
+    def __init__(self, tracker_file=DEFAULT_DB_FILE,
+                 legacy_file='.bandcamp_sync_tracker.json'):
         self.tracker_file = tracker_file
-        self.tracker = self._load_tracker()
-
-    def _load_tracker(self):
-        """Carga el tracker desde disco"""
-        if os.path.exists(self.tracker_file):
-            try:
-                with open(self.tracker_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                return {}
-        return {}
+        self.conn = _connect(tracker_file)
+
+        if not _table_exists(self.conn, 'sync'):
+            self.conn.execute(
+                'CREATE TABLE sync ('
+                ' genre TEXT NOT NULL,'
+                ' embed_id TEXT NOT NULL,'
+                ' url TEXT,'
+                ' added_at INTEGER,'
+                ' removed_at INTEGER,'
+                ' status TEXT NOT NULL,'
+                ' PRIMARY KEY (genre, embed_id))'
+            )
+            if legacy_file:
+                self._import_legacy(legacy_file)
+
+        # Conteo de activos por género, mantenido en memoria por mark_as_*
+        self._active_counts = dict(self.conn.execute(
+            "SELECT genre, COUNT(*) FROM sync WHERE status = 'active' GROUP BY genre"
+        ))
+
+    def _import_legacy(self, legacy_file):
+        """Importa el tracker JSON antiguo"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            tracker = _read_json_file(legacy_file)
+        except (json.JSONDecodeError, IOError):
+            print(f"⚠️  Error al leer tracker antiguo {legacy_file}, se ignora")
+            return
+
+        rows = []
+        for genre, embeds in tracker.items():
+            for embed_id, e in embeds.items():
+                removed_at = e.get('removed_at')
+                rows.append((genre, embed_id, e.get('url'),
+                             _iso_to_epoch(e.get('added_at')),
+                             _iso_to_epoch(removed_at) if removed_at else None,
+                             e.get('status', 'active')))
+
+        self.conn.execute('BEGIN')
+        self.conn.executemany('INSERT OR REPLACE INTO sync VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.conn.execute('COMMIT')
 
     def save(self):
-        """Guarda el tracker a disco"""
-        try:
-            with open(self.tracker_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tracker, f, indent=2, ensure_ascii=False)
-        except IOError as e:
-            print(f"⚠️  Error al guardar tracker: {e}")
+        """
+        No hace nada: la conexión está en autocommit y cada cambio ya se
+        confirma al momento. Se mantiene por compatibilidad con quien lo llama
+        al terminar.
+        """
+
+    def close(self):
+        """Cierra la base de datos"""
+        self.conn.close()
 
     def mark_as_added(self, genre, embed_id, url):
         """Marca un álbum como agregado a la colección"""
-        if genre not in self.tracker:
-            self.tracker[genre] = {}
-
-        if embed_id not in self.tracker[genre]:
-            self.tracker[genre][embed_id] = {
-                'url': url,
-                'added_at': datetime.now().isoformat(),
-                'status': 'active'
-            }
+        inserted = self.conn.execute(
+            "INSERT OR IGNORE INTO sync (genre, embed_id, url, added_at, status)"
+            " VALUES (?, ?, ?, ?, 'active')",
+            (genre, embed_id, url, int(time.time()))
+        ).rowcount
+        if inserted:
+            self._active_counts[genre] = self._active_counts.get(genre, 0) + 1
 
     def mark_as_removed(self, genre, embed_id):
         """Marca un álbum como eliminado de la colección"""
-        if genre in self.tracker and embed_id in self.tracker[genre]:
-            self.tracker[genre][embed_id]['removed_at'] = datetime.now().isoformat()
-            self.tracker[genre][embed_id]['status'] = 'removed'
+        row = self.conn.execute(
+            'SELECT status FROM sync WHERE genre = ? AND embed_id = ?',
+            (genre, embed_id)
+        ).fetchone()
+        if row is None:
+            return
+
+        self.conn.execute(
+            "UPDATE sync SET removed_at = ?, status = 'removed'"
+            " WHERE genre = ? AND embed_id = ?",
+            (int(time.time()), genre, embed_id)
+        )
+        if row[0] == 'active':
+            self._active_counts[genre] -= 1
 
     def was_previously_added(self, genre, embed_id):
         """Verifica si un álbum fue agregado previamente (y posiblemente eliminado)"""
-        return (genre in self.tracker and
-                embed_id in self.tracker[genre])
+        row = self.conn.execute(
+            'SELECT 1 FROM sync WHERE genre = ? AND embed_id = ? LIMIT 1',
+            (genre, embed_id)
+        ).fetchone()
+        return row is not None
 
     def was_removed(self, genre, embed_id):
         """Verifica si un álbum fue específicamente eliminado por el usuario"""
-        if genre in self.tracker and embed_id in self.tracker[genre]:
-            return self.tracker[genre][embed_id].get('status') == 'removed'
-        return False
+        row = self.conn.execute(
+            'SELECT status FROM sync WHERE genre = ? AND embed_id = ?',
+            (genre, embed_id)
+        ).fetchone()
+        return row is not None and row[0] == 'removed'
 
     def get_active_count(self, genre=None):
         """Obtiene el conteo de álbumes activos"""
         if genre:
-            if genre not in self.tracker:
-                return 0
-            return sum(1 for e in self.tracker[genre].values()
-                      if e.get('status') == 'active')
+            return self._active_counts.get(genre, 0)
 
         # Total de todos los géneros
-        return sum(sum(1 for e in embeds.values() if e.get('status') == 'active')
-                  for embeds in self.tracker.values())
+        return sum(self._active_counts.values())
 
 
 def get_embed_id(url):
-    """Genera el mismo ID que usa el HTML para un embed"""
-    return f"embed_{abs(hash(url))}"
+    """
+    Genera el mismo ID que usa el HTML para un embed.
+    Usa un digest de 64 bits (BLAKE2b) en lugar de hash(), que cambia en
+    cada ejecución de Python (PYTHONHASHSEED) y rompía el tracker.
+    """
+    return f"embed_{hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()}"
 
 
 if __name__ == '__main__':
@@ -225,4 +619,4 @@ if __name__ == '__main__':
     print("  if not cache.has(server, email, folder, message_id):")
     print("      # Procesar correo...")
     print("      cache.add(server, email, folder, message_id, embed_data)")
-    print("      cache.save()")
+    print("  cache.close()  # al terminar")
@@ -5,38 +5,161 @@ CON SISTEMA DE CACHÉ INTEGRADO para evitar descargar correos repetidos
 """
 
 import json
+import logging
+import re
 import sys
 import os
 from datetime import datetime
+from hashlib import blake2b
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Importar funciones del script original
 sys.path.insert(0, os.path.dirname(__file__))
 from bc_imap_generator import (
     IMAPConfig,
     IMAPSessionManager,
+    HEADER_FETCH_QUERY,
+    BODY_FETCH_QUERY,
     interactive_setup,
-    get_email_body,
+    get_saved_password,
+    get_email_body_bytes,
     decode_mime_header,
     extract_bandcamp_link,
-    get_bandcamp_embed
+    get_bandcamp_embed,
+    parse_fetch_response,
+    parse_header_fields,
+    raw_may_contain_link
 )
-from bc_cache_system import EmailCache, get_embed_id
+from bc_cache_system import EmailCache, normalize_date, sort_by_date, DEFAULT_MEMORY_ITEMS, MISS_KEY
 
 import argparse
 import getpass
 import email
 from email.utils import parsedate_to_datetime
 
+try:
+    # Opcional: serialización en C, bastante más rápida que json
+    import orjson
+except ImportError:
+    orjson = None
+
+# Los mensajes por correo van a DEBUG (se activan con --verbose)
+logger = logging.getLogger(__name__)
+
+# Descargas simultáneas de páginas de Bandcamp por carpeta
+EMBED_FETCH_WORKERS = 16
+
+# Máximo de mensajes por FETCH (evita "maximum request size exceeded")
+FETCH_BATCH_SIZE = 100
+
+# Máximo de mensajes por STORE
+STORE_BATCH_SIZE = 500
+
+# Campos de cada embed que se escriben en el JSON exportado
+EXPORT_FIELDS = ('url', 'embed', 'subject', 'date', 'date_obj', 'sender',
+                 'email_id', 'message_id', 'folder', 'genre')
+
+# Respuesta de STATUS: b'"INBOX" (UIDVALIDITY 1 HIGHESTMODSEQ 42)'
+_UIDVALIDITY_RE = re.compile(rb'UIDVALIDITY (\d+)')
+_HIGHESTMODSEQ_RE = re.compile(rb'HIGHESTMODSEQ (\d+)')
+
+
+def _batches(items, size=FETCH_BATCH_SIZE):
+    """Divide una lista de IDs en lotes de como mucho size elementos"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _folder_status(mail, folder_name):
+    """
+    Devuelve (UIDVALIDITY, HIGHESTMODSEQ) de una carpeta con un solo STATUS,
+    con HIGHESTMODSEQ = 0 si el servidor no soporta CONDSTORE/QRESYNC
+    (RFC 7162), o None si el STATUS falla.
+    """
+    condstore = bool({'CONDSTORE', 'QRESYNC'} & set(mail.capabilities))
+    items = '(UIDVALIDITY HIGHESTMODSEQ)' if condstore else '(UIDVALIDITY)'
+
+    try:
+        status, data = mail.status(f'"{folder_name}"', items)
+    except Exception:
+        return None
+
+    if status != 'OK' or not data or not data[0]:
+        return None
+
+    uidvalidity = _UIDVALIDITY_RE.search(data[0])
+    if not uidvalidity:
+        return None
+
+    highestmodseq = _HIGHESTMODSEQ_RE.search(data[0]) if condstore else None
+    return int(uidvalidity.group(1)), int(highestmodseq.group(1)) if highestmodseq else 0
+
+
+def _fetch_bodies(connections, folder_name, uids):
+    """
+    Descarga BODY_FETCH_QUERY de los UIDs en lotes de FETCH_BATCH_SIZE, repartidos
+    entre las conexiones (un hilo por conexión, cada una con sus lotes en
+    serie). La primera es la que ya tiene la carpeta seleccionada; las demás
+    la abren en solo lectura.
+
+    Returns:
+        ({UID: cuerpo en bruto}, True si algún lote falló)
+    """
+    batches = list(_batches(uids))
+    connections = connections[:len(batches)] or connections[:1]
+
+    def fetch_share(index):
+        conn = connections[index]
+        bodies = {}
+        failed = False
+        try:
+            if index > 0:
+                status, _ = conn.select(f'"{folder_name}"', readonly=True)
+                if status != 'OK':
+                    return bodies, True
+
+            for batch in batches[index::len(connections)]:
+                status, body_data = conn.uid('FETCH', b','.join(batch), BODY_FETCH_QUERY)
+
+                if status != 'OK':
+                    failed = True
+                    continue
+
+                bodies.update(parse_fetch_response(body_data, by_uid=True))
+        except Exception as e:
+            logger.warning("❌ Error descargando correos (conexión %d): %s", index + 1, e)
+            failed = True
+        return bodies, failed
+
+    if len(connections) == 1:
+        return fetch_share(0)
+
+    bodies = {}
+    failed = False
+    with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+        for share, share_failed in executor.map(fetch_share, range(len(connections))):
+            bodies.update(share)
+            failed = failed or share_failed
+    return bodies, failed
+
+
+def _miss_entry(reason):
+    """Entrada del caché para un correo descartado ('no_link', 'no_content', 'no_embed')"""
+    return {MISS_KEY: True, 'reason': reason}
+
 
 def datetime_serializer(obj):
-    """Serializador personalizado para objetos datetime"""
+    """Serializador personalizado para objetos datetime (y cualquier otro tipo)"""
     if isinstance(obj, datetime):
         return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+    # Convertir todo lo demás a string
+    return str(obj)
 
 
 def process_imap_folder_with_cache(mail, folder_name, genre, cache, mark_as_read=True,
-                                   include_read=False, config=None):
+                                   include_read=False, config=None,
+                                   max_workers=EMBED_FETCH_WORKERS, rescan_misses=False,
+                                   extra_connections=None):
     """
     Procesa una carpeta IMAP buscando enlaces de Bandcamp.
     USA CACHÉ para evitar descargar correos ya procesados.
@@ -49,6 +172,9 @@ def process_imap_folder_with_cache(mail, folder_name, genre, cache, mark_as_read
         mark_as_read: Si True, marca los correos como leídos después de procesarlos
         include_read: Si True, incluye correos ya leídos
         config: IMAPConfig para el caché
+        max_workers: Hilos para descargar los embeds en paralelo
+        rescan_misses: Si True, vuelve a procesar los correos descartados antes
+        extra_connections: Conexiones IMAP adicionales para descargar cuerpos en paralelo
 
     Returns:
         Lista de embeds de Bandcamp encontrados
@@ -61,6 +187,29 @@ def process_imap_folder_with_cache(mail, folder_name, genre, cache, mark_as_read
     print(f"{'='*80}\n")
 
     try:
+        # Sincronización incremental (CONDSTORE): si la carpeta no ha cambiado
+        # desde la última pasada completa, su resultado sale entero del caché
+        criteria = 'ALL' if include_read else 'UNSEEN'
+        # El modo guardado incluye si se marcaron como leídos: tras una pasada
+        # con --no-mark-read, la siguiente normal tiene que hacer el STORE
+        sync_mode = criteria + (' +SEEN' if mark_as_read else '')
+        folder_status = _folder_status(mail, folder_name)
+
+        # Con --rescan-misses no vale ningún atajo: los descartes solo se ven
+        # recorriendo los correos
+        state = None
+        if folder_status is not None:
+            state = cache.get_folder_state(config.server, config.email, folder_name)
+            if state and folder_status[1] and not rescan_misses and \
+                    (state['uidvalidity'], state['highestmodseq'], state['criteria']) == \
+                    folder_status + (sync_mode,):
+                embeds = cache.get_many(config.server, config.email, folder_name,
+                                        state['message_ids'])
+                print(f"⚡ Carpeta sin cambios (HIGHESTMODSEQ {folder_status[1]}): "
+                      f"{len(embeds)} embeds del caché")
+                sort_by_date(embeds)
+                return embeds
+
         # Seleccionar la carpeta
         status, messages = mail.select(f'"{folder_name}"', readonly=False)
 
@@ -75,142 +224,289 @@ def process_imap_folder_with_cache(mail, folder_name, genre, cache, mark_as_read
             print("ℹ️  Carpeta vacía")
             return embeds
 
-        # Buscar correos según el parámetro include_read
-        if include_read:
-            status, messages = mail.search(None, 'ALL')
-            print(f"🔍 Buscando TODOS los correos (leídos y no leídos)...")
+        # Con todos los correos (ALL) y el mismo UIDVALIDITY que la última
+        # pasada completa, solo se piden al servidor los UIDs posteriores
+        since_uid = 0
+        if include_read and state and state['max_uid'] and not rescan_misses and \
+                (state['uidvalidity'], state['criteria']) == (folder_status[0], sync_mode):
+            status, messages = mail.uid('SEARCH', None, 'UID', f"{state['max_uid'] + 1}:*")
+            if status == 'OK':
+                # "N:*" siempre incluye el último UID aunque sea menor que N
+                email_ids = [uid for uid in messages[0].split() if int(uid) > state['max_uid']]
+                # Si se borró algún correo antiguo, no cuadra: búsqueda completa
+                if state['uid_count'] + len(email_ids) == num_messages:
+                    since_uid = state['max_uid']
+
+        if since_uid:
+            print(f"🔍 Buscando correos posteriores al UID {since_uid}...")
+            embeds = cache.get_many(config.server, config.email, folder_name,
+                                    state['message_ids'])
         else:
-            status, messages = mail.search(None, 'UNSEEN')
-            print(f"🔍 Buscando solo correos NO LEÍDOS...")
+            # Buscar correos según el parámetro include_read. Se usan UIDs y no
+            # números de secuencia: no cambian si otro cliente borra correos
+            # entre el SEARCH y los FETCH/STORE
+            status, messages = mail.uid('SEARCH', None, criteria)
+            if include_read:
+                print(f"🔍 Buscando TODOS los correos (leídos y no leídos)...")
+            else:
+                print(f"🔍 Buscando solo correos NO LEÍDOS...")
 
-        if status != 'OK':
-            print("❌ Error al buscar correos")
-            return embeds
+            if status != 'OK':
+                print("❌ Error al buscar correos")
+                return embeds
+
+            email_ids = messages[0].split()
 
-        email_ids = messages[0].split()
         print(f"📬 Procesando {len(email_ids)} correos...\n")
 
-        if len(email_ids) == 0:
+        if len(email_ids) == 0 and not since_uid:
             print("ℹ️  No hay correos que procesar con los criterios especificados")
             return embeds
 
-        # Contadores de caché
-        cached_count = 0
+        # Contadores de caché (los embeds de antes del UID inicial vienen del caché)
+        cached_count = len(embeds)
         processed_count = 0
+        skipped_count = 0
+
+        # Correos a marcar como leídos al final (un solo STORE por carpeta)
+        to_mark = []
+
+        # Si algo falla, la carpeta no se da por sincronizada (se reintenta)
+        incomplete = False
+
+        # Correos con enlace pero sin embed todavía: (email_id, cache_key, embed_data)
+        misses = []
+
+        # Entradas nuevas del caché (embeds y descartes): (cache_key, entry)
+        new_entries = []
+
+        # Correos sin caché cuyo cuerpo hay que descargar
+        pending = []
+
+        # Funciones del bucle en variables locales (LOAD_FAST en vez de
+        # buscar en globales/atributos en cada correo)
+        parse_headers = parse_header_fields
+        decode = decode_mime_header
+        lookup = cache.lookup
+        parse_date = parsedate_to_datetime
+        message_from_bytes = email.message_from_bytes
+        body_bytes = get_email_body_bytes
+        extract_link = extract_bandcamp_link
+        may_contain_link = raw_may_contain_link
+        debug = logger.debug
+        verbose = logger.isEnabledFor(logging.DEBUG)
+        server, account = config.server, config.email
+
+        # Paso 1: cabeceras de todos los correos, en lotes de FETCH_BATCH_SIZE
+        headers_by_id = {}
+        for batch in _batches(email_ids):
+            status, header_data = mail.uid('FETCH', b','.join(batch), HEADER_FETCH_QUERY)
+
+            if status != 'OK':
+                print("❌ Error al obtener las cabeceras")
+                return embeds
+
+            headers_by_id.update(parse_fetch_response(header_data, by_uid=True))
 
         for i, email_id in enumerate(email_ids, 1):
             try:
-                # Obtener el correo
-                status, msg_data = mail.fetch(email_id, '(RFC822)')
+                raw_headers = headers_by_id.get(email_id)
 
-                if status != 'OK':
+                if raw_headers is None:
+                    incomplete = True
                     continue
 
-                # Parsear el correo
-                email_body = msg_data[0][1]
-                msg = email.message_from_bytes(email_body)
+                # Parsear solo las cabeceras (sin construir un Message)
+                headers = parse_headers(raw_headers)
 
                 # Obtener información del correo
-                subject = decode_mime_header(msg.get('Subject', ''))
-                sender = decode_mime_header(msg.get('From', ''))
-                date = msg.get('Date', '')
-                message_id = msg.get('Message-ID', '')
-
-                print(f"  [{i}/{len(email_ids)}] De: {sender[:50]}")
-                print(f"       Asunto: {subject[:70]}")
-
-                # VERIFICAR CACHÉ
-                if cache.has(config.server, config.email, folder_name, message_id):
-                    cached_data = cache.get(config.server, config.email, folder_name, message_id)
-
+                subject = decode(headers.get('subject', ''))
+                sender = decode(headers.get('from', ''))
+                date = headers.get('date', '')
+                message_id = headers.get('message-id', '')
+
+                if not message_id:
+                    # Sin Message-ID todos compartirían la clave '' del caché:
+                    # se deriva una estable entre ejecuciones de las cabeceras en bruto
+                    message_id = 'gen_' + blake2b(raw_headers, digest_size=12).hexdigest()
+
+                if verbose:
+                    debug("  [%d/%d] De: %s", i, len(email_ids), sender[:50])
+                    debug("       Asunto: %s", subject[:70])
+
+                # VERIFICAR CACHÉ (una sola consulta; la clave se reutiliza al añadir)
+                cache_key, cached_data = lookup(server, account, folder_name, message_id)
+
+                # Descartado en otra ejecución (sin enlace/embed): no se descarga
+                if cached_data is not None and cached_data.get(MISS_KEY):
+                    if not rescan_misses:
+                        skipped_count += 1
+                        debug("       • Descartado antes (%s)", cached_data.get('reason'))
+                        continue
+                    cached_data = None
+
+                if cached_data is not None:
                     # Usar datos del caché
                     embeds.append(cached_data)
                     cached_count += 1
 
-                    print(f"       ✅ Usando CACHÉ ({cached_count} cached)")
+                    debug("       ✅ Usando CACHÉ (%d cached)", cached_count)
 
                     # Marcar como leído si es necesario
                     if mark_as_read:
-                        mail.store(email_id, '+FLAGS', '\\Seen')
+                        to_mark.append(email_id)
 
                     continue
 
-                # NO ESTÁ EN CACHÉ - Procesar normalmente
+                # NO ESTÁ EN CACHÉ - se descarga completo en el paso 2
                 processed_count += 1
+                pending.append((email_id, cache_key, raw_headers, subject, sender, date, message_id))
+
+            except Exception as e:
+                logger.warning("       ❌ Error procesando correo: %s", e)
+                incomplete = True
+                continue
+
+        # Paso 2: cuerpos completos solo de los correos que no están en caché,
+        # repartidos entre la conexión principal y las adicionales
+        bodies_by_id, failed = _fetch_bodies([mail] + list(extra_connections or []),
+                                             folder_name, [item[0] for item in pending])
+
+        if failed:
+            print("❌ Error al descargar algunos correos")
+            incomplete = True
+
+        for email_id, cache_key, raw_headers, subject, sender, date, message_id in pending:
+            try:
+                raw_text = bodies_by_id.get(email_id)
+
+                if raw_text is None:
+                    incomplete = True
+                    continue
+
+                # Cabeceras del paso 1 (incluyen Content-Type/-Transfer-Encoding)
+                # + cuerpo: basta para parsear el MIME igual que el mensaje completo
+                raw_email = raw_headers.rstrip(b'\r\n') + b'\r\n\r\n' + raw_text
+
+                # Sin rastro de Bandcamp en los bytes en bruto no se parsea el MIME
+                if not may_contain_link(raw_email):
+                    debug("  %s • Sin enlaces de Bandcamp", subject[:70])
+                    new_entries.append((cache_key, _miss_entry('no_link')))
+                    continue
 
-                # Parsear fecha para ordenamiento
-                try:
-                    date_obj = parsedate_to_datetime(date) if date else None
-                except:
-                    date_obj = None
+                msg = message_from_bytes(raw_email)
 
-                # Extraer el cuerpo del correo
-                email_content = get_email_body(msg)
+                # Extraer el cuerpo del correo (en bytes: el enlace se busca sin decodificar)
+                email_content = body_bytes(msg)
 
                 if not email_content:
-                    print("       ⚠️  Sin contenido")
+                    debug("  %s ⚠️  Sin contenido", subject[:70])
+                    new_entries.append((cache_key, _miss_entry('no_content')))
                     continue
 
                 # Buscar enlace de Bandcamp
-                bandcamp_link = extract_bandcamp_link(email_content)
+                bandcamp_link = extract_link(email_content)
 
                 if bandcamp_link:
-                    print(f"       ✅ Enlace encontrado!")
-                    print(f"       🔗 URL completa: {bandcamp_link}")
-
-                    # Obtener el embed
-                    embed_code = get_bandcamp_embed(bandcamp_link)
-
-                    if embed_code:
-                        email_id_str = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
-
-                        embed_data = {
-                            'url': bandcamp_link,
-                            'embed': embed_code,
-                            'subject': subject,
-                            'date': date,
-                            'date_obj': date_obj,
-                            'sender': sender,
-                            'email_id': email_id_str,
-                            'message_id': message_id,
-                            'folder': folder_name,
-                            'genre': genre
-                        }
-
-                        embeds.append(embed_data)
-
-                        # GUARDAR EN CACHÉ
-                        cache.add(config.server, config.email, folder_name,
-                                message_id, embed_data)
-
-                        print(f"       ✅ Embed obtenido y guardado en caché ({len(embeds)} total)")
-
-                        # Marcar como leído
-                        if mark_as_read:
-                            mail.store(email_id, '+FLAGS', '\\Seen')
-                            print(f"       📖 Marcado como leído")
-                    else:
-                        print(f"       ⚠️  No se pudo obtener el embed")
+                    debug("  %s 🔗 %s", subject[:70], bandcamp_link)
+
+                    email_id_str = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
+
+                    # Parsear fecha para ordenamiento (sin fecha: MIN_DATE); solo
+                    # aquí, los correos descartados no la necesitan
+                    try:
+                        date_obj = normalize_date(parse_date(date) if date else None)
+                    except:
+                        date_obj = normalize_date(None)
+
+                    # El embed se rellena en el paso 3
+                    embed_data = {
+                        'url': bandcamp_link,
+                        'embed': None,
+                        'subject': subject,
+                        'date': date,
+                        'date_obj': date_obj,
+                        'sender': sender,
+                        'email_id': email_id_str,
+                        'message_id': message_id,
+                        'folder': folder_name,
+                        'genre': genre
+                    }
+
+                    misses.append((email_id, cache_key, embed_data))
                 else:
-                    print("       • Sin enlaces de Bandcamp")
+                    debug("  %s • Sin enlaces de Bandcamp", subject[:70])
+                    new_entries.append((cache_key, _miss_entry('no_link')))
 
             except Exception as e:
-                print(f"       ❌ Error procesando correo: {e}")
+                logger.warning("       ❌ Error procesando correo: %s", e)
+                incomplete = True
                 continue
 
-        # Guardar caché después de procesar la carpeta
+        # Paso 3: descargar los embeds en paralelo (E/S de red independiente por URL)
+        if misses:
+            unique_links = list(dict.fromkeys(embed_data['url'] for _, _, embed_data in misses))
+            print(f"\n🌐 Descargando {len(unique_links)} embeds ({max_workers} hilos)...")
+
+            # Los resultados se recogen según terminan; el orden final lo da el sort
+            embed_by_link = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(get_bandcamp_embed, link): link for link in unique_links}
+                for done, future in enumerate(as_completed(futures), 1):
+                    link = futures[future]
+                    embed_by_link[link] = future.result()
+                    logger.debug("  [%d/%d] 🌐 %s", done, len(futures), link)
+
+            for email_id, cache_key, embed_data in misses:
+                embed_code = embed_by_link.get(embed_data['url'])
+
+                if not embed_code:
+                    logger.warning("  ⚠️  No se pudo obtener el embed: %s", embed_data['url'])
+                    new_entries.append((cache_key, _miss_entry('no_embed')))
+                    incomplete = True
+                    continue
+
+                embed_data['embed'] = embed_code
+                embeds.append(embed_data)
+                new_entries.append((cache_key, embed_data))
+
+                # Marcar como leído
+                if mark_as_read:
+                    to_mark.append(email_id)
+
+            print(f"✅ Embeds obtenidos ({len(embeds)} total)")
+
+        # GUARDAR EN CACHÉ (una sola transacción por carpeta)
+        cache.add_many(new_entries)
+
+        if to_mark:
+            # .SILENT: el servidor no devuelve un FETCH por cada mensaje
+            for batch in _batches(to_mark, STORE_BATCH_SIZE):
+                mail.uid('STORE', b','.join(batch), '+FLAGS.SILENT', '\\Seen')
+            print(f"\n📖 {len(to_mark)} correos marcados como leídos")
+
+        # add_many() ya confirmó las entradas nuevas en su transacción
         if processed_count > 0:
-            cache.save()
-            print(f"\n💾 Caché guardado ({processed_count} nuevos, {cached_count} reutilizados)")
+            print(f"\n💾 Caché actualizado ({processed_count} nuevos, {cached_count} reutilizados)")
+
+        # Se guarda el STATUS leído antes del SEARCH: si la carpeta cambió
+        # después (correo nuevo, el STORE de arriba...) la próxima vez no coincide
+        if folder_status is not None and not incomplete:
+            cache.set_folder_state(config.server, config.email, folder_name,
+                                   folder_status[0], folder_status[1], sync_mode,
+                                   [e.get('message_id') for e in embeds],
+                                   max_uid=max([since_uid] + [int(uid) for uid in email_ids]),
+                                   uid_count=len(email_ids) + (state['uid_count'] if since_uid else 0))
 
         print(f"\n{'='*80}")
         print(f"✅ Procesamiento completado: {len(embeds)} embeds encontrados")
         print(f"   📦 Del caché: {cached_count}")
         print(f"   🆕 Procesados: {processed_count}")
+        print(f"   ⏭️  Descartados antes: {skipped_count}")
         print(f"{'='*80}\n")
 
         # Ordenar por fecha (más reciente primero)
-        embeds.sort(key=lambda x: x.get('date_obj') or datetime.min, reverse=True)
+        sort_by_date(embeds)
 
     except Exception as e:
         print(f"❌ Error al procesar carpeta {folder_name}: {e}")
@@ -225,33 +521,23 @@ def export_to_json(embeds_by_genre, output_file):
     """
     print(f"\n💾 Exportando a JSON...")
 
-    # Preparar datos para JSON
-    export_data = {}
-
-    for genre, embeds in embeds_by_genre.items():
-        export_data[genre] = []
-
-        for embed in embeds:
-            # Crear copia limpia
-            embed_copy = {}
-
-            for key, value in embed.items():
-                # Convertir datetime a string
-                if isinstance(value, datetime):
-                    embed_copy[key] = value.isoformat()
-                # Mantener None y otros tipos serializables
-                elif value is None or isinstance(value, (str, int, float, bool, list, dict)):
-                    embed_copy[key] = value
-                # Convertir todo lo demás a string
-                else:
-                    embed_copy[key] = str(value)
-
-            export_data[genre].append(embed_copy)
+    # Solo los campos de EXPORT_FIELDS: los internos del caché (cache_key...)
+    # no llegan al serializador. Los tipos no nativos (datetime, etc.) los
+    # resuelve datetime_serializer durante la serialización
+    export_data = {
+        genre: [{key: embed[key] for key in EXPORT_FIELDS if key in embed} for embed in embeds]
+        for genre, embeds in embeds_by_genre.items()
+    }
 
     # Guardar a JSON con manejo de errores
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2, default=datetime_serializer)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(export_data, default=datetime_serializer,
+                                     option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(export_data, f, ensure_ascii=False, indent=2, default=datetime_serializer)
 
         # Verificar que el archivo se creó
         if os.path.exists(output_file):
@@ -281,6 +567,9 @@ def main():
     parser.add_argument('--port', type=int, default=993, help='Puerto IMAP (default: 993)')
     parser.add_argument('--email', help='Dirección de email')
     parser.add_argument('--password', help='Contraseña (no recomendado, usa --interactive)')
+    parser.add_argument('--remember-password', action='store_true',
+                       help='Guardar la contraseña en el llavero del sistema tras un login '
+                            'correcto (necesita keyring)')
 
     # Opciones de operación
     parser.add_argument('--folders', nargs='+', required=True,
@@ -290,24 +579,40 @@ def main():
     parser.add_argument('--include-read', action='store_true',
                        help='Incluir correos ya leídos (por defecto solo procesa no leídos)')
 
+    parser.add_argument('--imap-connections', type=int, default=1,
+                       help='Conexiones IMAP para descargar correos en paralelo (default: 1)')
+    parser.add_argument('--workers', type=int, default=EMBED_FETCH_WORKERS,
+                       help=f'Descargas simultáneas de embeds por carpeta (default: {EMBED_FETCH_WORKERS})')
+
     # Opciones de salida
     parser.add_argument('--output', default='bandcamp_data.json',
                        help='Archivo JSON de salida (default: bandcamp_data.json)')
 
     # Opciones de caché
-    parser.add_argument('--cache-file', default='.bandcamp_cache.json',
-                       help='Archivo de caché (default: .bandcamp_cache.json)')
+    parser.add_argument('--cache-file', default='.bandcamp_cache.db',
+                       help='Base de datos SQLite del caché (default: .bandcamp_cache.db)')
     parser.add_argument('--no-cache', action='store_true',
                        help='Desactivar sistema de caché (forzar procesamiento completo)')
     parser.add_argument('--clear-cache', action='store_true',
                        help='Limpiar caché antes de empezar')
     parser.add_argument('--cache-stats', action='store_true',
                        help='Mostrar estadísticas del caché y salir')
+    parser.add_argument('--rescan-misses', action='store_true',
+                       help='Volver a procesar los correos que antes no dieron embed')
+    parser.add_argument('--cache-memory-items', type=int, default=DEFAULT_MEMORY_ITEMS,
+                       help=f'Entradas del caché en memoria, 0 para desactivar (default: {DEFAULT_MEMORY_ITEMS})')
+
+    # Opciones de salida por consola
+    parser.add_argument('--verbose', action='store_true',
+                       help='Mostrar el detalle de cada correo procesado')
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(message)s', stream=sys.stdout)
+
     # Inicializar caché
-    cache = EmailCache(args.cache_file)
+    cache = EmailCache(args.cache_file, memory_items=args.cache_memory_items)
 
     # Mostrar estadísticas del caché si se solicita
     if args.cache_stats:
@@ -316,33 +621,35 @@ def main():
         print("📊 ESTADÍSTICAS DEL CACHÉ")
         print("="*70)
         print(f"   Total correos en caché: {stats['total_emails']}")
+        print(f"   Descartados (sin embed): {stats['misses']}")
         print(f"   Servidores: {stats['servers']}")
         print(f"   Cuentas: {stats['accounts']}")
         print(f"   Carpetas: {stats['folders']}")
-        print(f"\n   Archivo: {args.cache_file}")
-        if os.path.exists(args.cache_file):
-            size = os.path.getsize(args.cache_file)
+        print(f"\n   Archivo: {cache.cache_file}")
+        if os.path.exists(cache.cache_file):
+            size = os.path.getsize(cache.cache_file)
             print(f"   Tamaño: {size:,} bytes")
         print()
         return
 
     # Limpiar caché si se solicita
     if args.clear_cache:
-        if os.path.exists(args.cache_file):
-            os.remove(args.cache_file)
-            print(f"🗑️  Caché limpiado: {args.cache_file}")
-            cache = EmailCache(args.cache_file)
+        if cache.get_stats()['total_emails'] > 0:
+            cache.clear()
+            print(f"🗑️  Caché limpiado: {cache.cache_file}")
         else:
             print(f"ℹ️  No hay caché para limpiar")
 
     # Configurar conexión IMAP
     if args.interactive:
         config = interactive_setup()
+        config.remember_password = config.remember_password or args.remember_password
     elif args.server and args.email:
-        password = args.password
+        password = args.password or get_saved_password(args.server, args.email)
         if not password:
             password = getpass.getpass(f"Contraseña para {args.email}: ")
-        config = IMAPConfig(args.server, args.port, args.email, password)
+        config = IMAPConfig(args.server, args.port, args.email, password,
+                            remember_password=args.remember_password)
     else:
         print("❌ Debes usar --interactive o proporcionar --server y --email")
         print("Usa --help para ver ejemplos de uso")
@@ -362,6 +669,14 @@ def main():
         mark_as_read = not args.no_mark_read
         include_read = args.include_read
 
+        # Conexiones adicionales para descargar cuerpos en paralelo
+        extra_connections = []
+        if args.imap_connections > 1:
+            try:
+                extra_connections = session.get_extra_connections(args.imap_connections - 1)
+            except Exception as e:
+                print(f"⚠️  No se pudieron abrir conexiones adicionales, se usa una: {e}")
+
         print(f"\n{'='*80}")
         print(f"📧 EXPORTANDO CORREOS A JSON (CON CACHÉ)")
         print(f"{'='*80}")
@@ -372,9 +687,10 @@ def main():
         print(f"Caché: {'Desactivado' if args.no_cache else 'Activado'}")
         print(f"{'='*80}\n")
 
-        # Si no se quiere caché, usar uno temporal
+        # Si no se quiere caché, usar uno temporal en memoria
         if args.no_cache:
-            cache = EmailCache(':memory:')  # Esto fallará, pero el punto es no guardarlo
+            cache.close()
+            cache = EmailCache(':memory:')
 
         for folder_spec in args.folders:
             if ':' in folder_spec:
@@ -392,7 +708,10 @@ def main():
                     mail, folder_name, genre, cache,
                     mark_as_read=mark_as_read,
                     include_read=include_read,
-                    config=config
+                    config=config,
+                    max_workers=args.workers,
+                    rescan_misses=args.rescan_misses,
+                    extra_connections=extra_connections
                 )
 
                 if genre not in embeds_by_genre:
@@ -459,7 +778,8 @@ def main():
         traceback.print_exc()
 
     finally:
-        # Cerrar sesión
+        # Cerrar el caché (cada escritura ya está confirmada) y la sesión
+        cache.close()
         session.disconnect()
         print("\n✅ Sesión IMAP cerrada")
 
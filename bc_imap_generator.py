@@ -8,31 +8,124 @@ Versión 2: Con botones de acción y API para gestionar correos
 import os
 import re
 import email
+import gzip
 import json
-from pathlib import Path
-from html import escape
-from collections import defaultdict
-from urllib.parse import urlparse, parse_qs
+import logging
+import sys
+from html import escape, unescape
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import lru_cache
 import argparse
 import urllib.request
 import time
-from html.parser import HTMLParser
-import imaplib
-import getpass
+import queue
 from email.header import decode_header
 from email.utils import parsedate_to_datetime
-from datetime import datetime
-from datetime import datetime
+
+from bc_cache_system import normalize_date, sort_by_date
+
+try:
+    # Opcional: sesión HTTP que reutiliza las conexiones (keep-alive) entre descargas
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+try:
+    # Opcional: guarda la contraseña en el llavero del sistema entre ejecuciones
+    import keyring
+except ImportError:
+    keyring = None
+
+try:
+    # Opcional: serialización en C, bastante más rápida que json
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Los mensajes por correo y por página van a DEBUG (se activan con --verbose)
+logger = logging.getLogger(__name__)
+
+# Correos por comando FETCH (algunos servidores limitan el tamaño de la petición)
+FETCH_BATCH_SIZE = 100
+
+# Correos por comando STORE al marcar como leídos/eliminados
+STORE_BATCH_SIZE = 500
+
+# Descargas simultáneas de páginas de Bandcamp por carpeta
+EMBED_FETCH_WORKERS = 16
+
+# Conexiones IMAP para procesar carpetas en paralelo (acotado: los servidores
+# limitan las sesiones simultáneas por cuenta)
+IMAP_CONNECTIONS = 4
+
+# Solo las cabeceras que se usan (PEEK: no marca como leído), más las MIME,
+# que con BODY_FETCH_QUERY permiten reconstruir el mensaje
+HEADER_FETCH_QUERY = ('(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE'
+                      ' CONTENT-TYPE CONTENT-TRANSFER-ENCODING)])')
+
+# Cuerpo sin cabeceras (Received, DKIM... ni adjuntos fuera del MIME de texto)
+BODY_FETCH_QUERY = '(BODY.PEEK[TEXT])'
+
+# Remitente por el que filtra el servidor en el SEARCH ('' = sin filtro).
+# Los correos de Bandcamp reenviados o de otros remitentes quedan fuera:
+# --search-from '' vuelve a procesar todos los de la carpeta
+SEARCH_FROM = 'bandcamp.com'
+
+# Segundos que se reutiliza la lista de carpetas guardada en la sesión
+FOLDER_CACHE_TTL = 3600
+
+# Segundos de inactividad tras los que se comprueba una conexión (NOOP)
+# antes de reutilizarla para otra carpeta
+IMAP_KEEPALIVE_IDLE = 300
+
+
+def _keyring_service(server):
+    """Nombre del servicio en el llavero para un servidor IMAP"""
+    return f"bcimap:{server}"
+
+
+def get_saved_password(server, email_address):
+    """
+    Contraseña guardada en el llavero del sistema para (servidor, email),
+    o None si no hay keyring, no hay contraseña o el llavero falla.
+    """
+    if keyring is None:
+        return None
+    try:
+        return keyring.get_password(_keyring_service(server), email_address)
+    except Exception:
+        return None
+
+
+def save_password(config):
+    """
+    Guarda la contraseña en el llavero (tras un login correcto y solo si se
+    pidió con --remember-password), para que las siguientes ejecuciones no la pidan.
+    """
+    if keyring is None or not config.password:
+        return
+    if get_saved_password(config.server, config.email) == config.password:
+        return
+    try:
+        keyring.set_password(_keyring_service(config.server), config.email, config.password)
+        print("🔐 Contraseña guardada en el llavero del sistema")
+    except Exception as e:
+        print(f"⚠️  No se pudo guardar la contraseña en el llavero: {e}")
 
 
 class IMAPConfig:
     """Configuración para conexión IMAP"""
-    def __init__(self, server, port, email_address, password, use_ssl=True):
+    def __init__(self, server, port, email_address, password, use_ssl=True,
+                 remember_password=False):
         self.server = server
         self.port = port
         self.email = email_address
         self.password = password
         self.use_ssl = use_ssl
+        self.remember_password = remember_password
 
 
 class IMAPSessionManager:
@@ -43,6 +136,8 @@ class IMAPSessionManager:
     def __init__(self):
         self.config = None
         self.mail = None
+        self.extra = []
+        self.last_used = {}
 
     @classmethod
     def get_instance(cls):
@@ -50,13 +145,25 @@ class IMAPSessionManager:
             cls._instance = cls()
         return cls._instance
 
-    def save_config(self, config):
-        """Guarda la configuración (sin contraseña) para recordar servidor/email"""
+    def save_config(self, config, folders=None):
+        """
+        Guarda la configuración (sin contraseña) para recordar servidor/email,
+        junto con la lista de carpetas si se indica. Si no, conserva la ya
+        guardada mientras sea de la misma cuenta.
+        """
         data = {
             'server': config.server,
             'port': config.port,
             'email': config.email
         }
+        if folders is not None:
+            data['folders'] = folders
+            data['folders_ts'] = time.time()
+        else:
+            saved = self.load_config() or {}
+            if (saved.get('server'), saved.get('email')) == (config.server, config.email) and 'folders' in saved:
+                data['folders'] = saved['folders']
+                data['folders_ts'] = saved.get('folders_ts', 0)
         with open(self._config_file, 'w') as f:
             json.dump(data, f)
 
@@ -68,25 +175,90 @@ class IMAPSessionManager:
         return None
 
     def connect(self, config):
-        """Conecta y guarda la sesión"""
+        """
+        Conecta y guarda la sesión. Si el login falla con la contraseña del
+        llavero (puede haber cambiado), se pide por teclado y se reintenta.
+        """
+        import imaplib
+
         self.config = config
-        self.mail = connect_imap(config)
+        try:
+            self.mail = connect_imap(config)
+        except imaplib.IMAP4.error:
+            if not config.password or config.password != get_saved_password(config.server, config.email):
+                raise
+            import getpass
+            print("⚠️  La contraseña guardada en el llavero no es válida")
+            if not config.remember_password:
+                print("   (usa --remember-password para sustituirla)")
+            config.password = getpass.getpass(f"Contraseña para {config.email}: ")
+            self.mail = connect_imap(config)
+        self.touch(self.mail)
         self.save_config(config)
+        if config.remember_password:
+            save_password(config)
         return self.mail
 
     def get_connection(self):
         """Obtiene la conexión activa"""
         return self.mail
 
+    def get_extra_connections(self, count):
+        """
+        Conexiones adicionales con la misma configuración, para repartir
+        descargas en paralelo. Se abren una vez y se reutilizan.
+        """
+        while len(self.extra) < count:
+            mail = connect_imap(self.config)
+            self.touch(mail)
+            self.extra.append(mail)
+        return self.extra[:count]
+
+    def touch(self, mail):
+        """Anota que la conexión se acaba de usar"""
+        self.last_used[id(mail)] = time.monotonic()
+
+    def ensure_alive(self, mail):
+        """
+        Antes de reutilizar una conexión: si lleva más de IMAP_KEEPALIVE_IDLE
+        segundos parada se comprueba con NOOP (el servidor puede haberla
+        cerrado por inactividad) y, si falla, se sustituye por una nueva.
+
+        Returns:
+            La conexión, o la nueva que la reemplaza
+        """
+        idle = time.monotonic() - self.last_used.get(id(mail), time.monotonic())
+        if idle <= IMAP_KEEPALIVE_IDLE:
+            return mail
+
+        try:
+            mail.noop()
+            self.touch(mail)
+            return mail
+        except Exception as e:
+            print(f"⚠️  Conexión IMAP perdida ({e}), reconectando...")
+
+        new_mail = connect_imap(self.config)
+        self.last_used.pop(id(mail), None)
+        self.touch(new_mail)
+        if mail is self.mail:
+            self.mail = new_mail
+        elif mail in self.extra:
+            self.extra[self.extra.index(mail)] = new_mail
+        return new_mail
+
     def disconnect(self):
-        """Cierra la conexión"""
-        if self.mail:
-            try:
-                self.mail.close()
-                self.mail.logout()
-            except:
-                pass
-            self.mail = None
+        """Cierra la conexión (y las adicionales)"""
+        for mail in [self.mail] + self.extra:
+            if mail:
+                try:
+                    mail.close()
+                    mail.logout()
+                except:
+                    pass
+        self.mail = None
+        self.extra = []
+        self.last_used = {}
 
 
 def connect_imap(config):
@@ -99,6 +271,9 @@ def connect_imap(config):
     Returns:
         Objeto IMAP4_SSL o IMAP4 conectado y autenticado
     """
+    # Solo al conectar: imaplib arrastra ssl/socket/hmac
+    import imaplib
+
     try:
         print(f"🔌 Conectando a {config.server}:{config.port}...")
 
@@ -128,22 +303,40 @@ def decode_mime_header(header):
     if header is None:
         return ""
 
+    if isinstance(header, str):
+        # Sin palabras codificadas (=?charset?...?=) no hay nada que decodificar
+        if '=?' not in header:
+            return header
+        # Los remitentes se repiten mucho en una carpeta: cada valor se decodifica una vez
+        return _decode_encoded_header(header)
+
+    # email.header.Header no es hashable: sin memoizar
+    return _decode_encoded_header.__wrapped__(header)
+
+
+@lru_cache(maxsize=4096)
+def _decode_encoded_header(header):
+    """Decodifica las palabras codificadas de un header (memoizado por valor)"""
     decoded_parts = decode_header(header)
-    decoded_str = ""
+    decoded = []
 
     for part, encoding in decoded_parts:
         if isinstance(part, bytes):
             if encoding:
                 try:
-                    decoded_str += part.decode(encoding)
+                    decoded.append(part.decode(encoding))
                 except:
-                    decoded_str += part.decode('utf-8', errors='ignore')
+                    decoded.append(part.decode('utf-8', errors='ignore'))
             else:
-                decoded_str += part.decode('utf-8', errors='ignore')
+                decoded.append(part.decode('utf-8', errors='ignore'))
         else:
-            decoded_str += str(part)
+            decoded.append(str(part))
 
-    return decoded_str
+    return ''.join(decoded)
+
+
+# Nombre de carpeta en una línea de LIST: b'(\\HasNoChildren) "/" "INBOX/Rock"'
+_LIST_NAME_RE = re.compile(rb'"([^"]+)"$')
 
 
 def get_imap_folders(mail):
@@ -158,16 +351,131 @@ def get_imap_folders(mail):
 
     if status == 'OK':
         for folder in folders:
-            # Decodificar el nombre de la carpeta
-            folder_str = folder.decode()
             # Extraer el nombre (está entre comillas al final)
-            match = re.search(r'"([^"]+)"$', folder_str)
+            match = _LIST_NAME_RE.search(folder)
             if match:
-                folder_names.append(match.group(1))
+                folder_names.append(match.group(1).decode())
 
     return folder_names
 
 
+def get_folders_cached(mail, refresh=False, max_age=FOLDER_CACHE_TTL):
+    """
+    Como get_imap_folders, pero reutiliza la lista guardada en la sesión
+    mientras tenga menos de max_age segundos (las carpetas cambian poco).
+
+    Returns:
+        Lista de nombres de carpetas
+    """
+    session = IMAPSessionManager.get_instance()
+    saved = session.load_config() or {}
+    config = session.config
+
+    if (not refresh and config is not None and 'folders' in saved
+            and (saved.get('server'), saved.get('email')) == (config.server, config.email)
+            and time.time() - saved.get('folders_ts', 0) < max_age):
+        return saved['folders']
+
+    folders = get_imap_folders(mail)
+    if config is not None:
+        session.save_config(config, folders)
+    return folders
+
+
+# UID dentro de una respuesta de FETCH: b'3 (UID 103 BODY[] {n}'
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+
+
+def parse_fetch_response(msg_data, by_uid=False):
+    """
+    Convierte la respuesta de un FETCH de varios mensajes en un diccionario.
+
+    imaplib devuelve una lista con tuplas (b'<id> (<item> {n}', b'<datos>')
+    separadas por b')'. Con by_uid (respuesta de UID FETCH) la clave es el
+    UID; algunos servidores lo envían después del literal, en el b' UID n)'
+    que sigue a la tupla.
+
+    Returns:
+        Dict {email_id o UID (bytes): datos (bytes)}
+    """
+    result = {}
+    pending = None
+    for item in msg_data:
+        if isinstance(item, tuple):
+            if not by_uid:
+                result[item[0].split(None, 1)[0]] = item[1]
+                continue
+            match = _FETCH_UID_RE.search(item[0])
+            if match:
+                result[match.group(1)] = item[1]
+                pending = None
+            else:
+                pending = item[1]
+        elif pending is not None and isinstance(item, bytes):
+            match = _FETCH_UID_RE.search(item)
+            if match:
+                result[match.group(1)] = pending
+            pending = None
+    return result
+
+
+def parse_header_fields(raw_headers):
+    """
+    Parsea un bloque de cabeceras (p. ej. de BODY.PEEK[HEADER.FIELDS (...)])
+    sin construir un email.message.Message completo.
+
+    Como msg.get(), gana la primera aparición de cada cabecera y las líneas
+    plegadas se conservan tal cual.
+
+    Returns:
+        Dict {nombre en minúsculas: valor (str)}
+    """
+    headers = {}
+    name = None
+    value = []
+
+    for line in raw_headers.split(b'\n'):
+        line = line.rstrip(b'\r')
+
+        # Línea plegada: continúa la cabecera anterior
+        if line[:1] in (b' ', b'\t'):
+            if name is not None:
+                value.append(line + b'\r\n')
+            continue
+
+        if name is not None:
+            headers.setdefault(name, b''.join(value).rstrip(b'\r\n').decode('utf-8', errors='replace'))
+            name = None
+
+        # Línea en blanco: fin de las cabeceras
+        if not line:
+            break
+
+        field, sep, rest = line.partition(b':')
+        if sep:
+            name = field.strip().lower().decode('ascii', errors='replace')
+            value = [rest.lstrip(b' \t') + b'\r\n']
+
+    if name is not None:
+        headers.setdefault(name, b''.join(value).rstrip(b'\r\n').decode('utf-8', errors='replace'))
+
+    return headers
+
+
+# Partes cuyo texto no aparece literal en los bytes del mensaje
+_ENCODED_PART_RE = re.compile(rb'content-transfer-encoding:[ \t]*(?:base64|quoted-printable)',
+                              re.IGNORECASE)
+
+
+def raw_may_contain_link(raw_email):
+    """
+    Comprobación previa sobre el mensaje en bruto, antes de parsear el MIME.
+    Si ninguna parte va en base64/quoted-printable, el texto está tal cual en
+    los bytes: sin "bandcamp.com" no puede haber enlace.
+    """
+    return b'bandcamp.com' in raw_email or _ENCODED_PART_RE.search(raw_email) is not None
+
+
 def get_email_body(msg):
     """
     Extrae el cuerpo del correo (texto plano o HTML).
@@ -178,7 +486,7 @@ def get_email_body(msg):
     Returns:
         String con el contenido del correo
     """
-    body = ""
+    parts = []
 
     if msg.is_multipart():
         # Si el mensaje es multipart, buscar en todas las partes
@@ -193,7 +501,7 @@ def get_email_body(msg):
                         payload = part.get_payload(decode=True)
                         if payload:
                             charset = part.get_content_charset() or 'utf-8'
-                            body += payload.decode(charset, errors='ignore')
+                            parts.append(payload.decode(charset, errors='ignore'))
                     except:
                         pass
     else:
@@ -202,14 +510,52 @@ def get_email_body(msg):
             payload = msg.get_payload(decode=True)
             if payload:
                 charset = msg.get_content_charset() or 'utf-8'
-                body = payload.decode(charset, errors='ignore')
+                parts.append(payload.decode(charset, errors='ignore'))
         except:
             pass
 
-    return body
+    return ''.join(parts)
 
 
-def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_read=False, delete_after=False, config=None):
+def get_email_body_bytes(msg):
+    """
+    Como get_email_body, pero sin decodificar el charset.
+
+    Args:
+        msg: Objeto email.message.Message
+
+    Returns:
+        Bytes con el contenido del correo (ya sin base64/quoted-printable)
+    """
+    parts = []
+
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+
+            if "attachment" not in content_disposition:
+                if content_type == "text/plain" or content_type == "text/html":
+                    try:
+                        payload = part.get_payload(decode=True)
+                        if payload:
+                            parts.append(payload)
+                    except:
+                        pass
+    else:
+        try:
+            payload = msg.get_payload(decode=True)
+            if payload:
+                parts.append(payload)
+        except:
+            pass
+
+    return b''.join(parts)
+
+
+def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_read=False, delete_after=False, config=None,
+                        fetch_batch_size=FETCH_BATCH_SIZE, max_workers=EMBED_FETCH_WORKERS,
+                        search_from=SEARCH_FROM, store_batch_size=STORE_BATCH_SIZE):
     """
     Procesa una carpeta IMAP buscando enlaces de Bandcamp.
 
@@ -221,6 +567,10 @@ def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_rea
         include_read: Si True, incluye correos ya leídos (por defecto solo no leídos)
         delete_after: Si True, elimina los correos después de procesarlos
         config: IMAPConfig para guardar en metadata
+        fetch_batch_size: Correos descargados por cada comando FETCH
+        max_workers: Hilos para descargar los embeds en paralelo
+        search_from: Solo correos cuyo From contiene este texto (filtra el servidor)
+        store_batch_size: Correos marcados por cada comando STORE
 
     Returns:
         Lista de embeds de Bandcamp encontrados
@@ -247,13 +597,23 @@ def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_rea
             print("ℹ️  Carpeta vacía")
             return embeds
 
-        # Buscar correos según el parámetro include_read
+        # Buscar correos según el parámetro include_read; el filtro por
+        # remitente lo resuelve el servidor con su índice
+        criteria = ['ALL' if include_read else 'UNSEEN']
+        if search_from:
+            criteria += ['FROM', '"%s"' % search_from.replace('"', '')]
+
+        status, messages = mail.search(None, *criteria)
         if include_read:
-            status, messages = mail.search(None, 'ALL')
             print(f"🔍 Buscando TODOS los correos (leídos y no leídos)...")
         else:
-            status, messages = mail.search(None, 'UNSEEN')
             print(f"🔍 Buscando solo correos NO LEÍDOS...")
+        # El filtro deja fuera reenvíos y correos de otros remitentes: se
+        # avisa siempre de cuál está activo y de cómo quitarlo
+        if search_from:
+            print(f"   Solo de remitentes con: {search_from} (--search-from '' para no filtrar)")
+        else:
+            print("   Sin filtro de remitente")
 
         if status != 'OK':
             print("❌ Error al buscar correos")
@@ -266,88 +626,146 @@ def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_rea
             print("ℹ️  No hay correos que procesar con los criterios especificados")
             return embeds
 
+        # Correos a marcar al final (un STORE por lote, no uno por correo)
+        to_mark_seen = []
+        to_delete = []
+
+        # Correos con enlace, a la espera del embed: (email_id, embed_data)
+        found = []
+
+        # Cabeceras y cuerpo por lotes (un FETCH de cada por lote, no por correo).
+        # Con PEEK el servidor no marca nada como leído: solo el STORE de abajo
+        headers_by_id = {}
+        bodies_by_id = {}
+        for start in range(0, len(email_ids), fetch_batch_size):
+            batch = b','.join(email_ids[start:start + fetch_batch_size])
+            status, header_data = mail.fetch(batch, HEADER_FETCH_QUERY)
+            if status == 'OK':
+                status, body_data = mail.fetch(batch, BODY_FETCH_QUERY)
+
+            if status != 'OK':
+                print("❌ Error al descargar un lote de correos")
+                continue
+
+            headers_by_id.update(parse_fetch_response(header_data))
+            bodies_by_id.update(parse_fetch_response(body_data))
+
         for i, email_id in enumerate(email_ids, 1):
             try:
-                # Obtener el correo
-                status, msg_data = mail.fetch(email_id, '(RFC822)')
+                raw_headers = headers_by_id.get(email_id)
+                raw_text = bodies_by_id.get(email_id)
 
-                if status != 'OK':
+                if raw_headers is None or raw_text is None:
                     continue
 
-                # Parsear el correo
-                email_body = msg_data[0][1]
-                msg = email.message_from_bytes(email_body)
+                # Parsear solo las cabeceras (sin construir un Message)
+                headers = parse_header_fields(raw_headers)
 
                 # Obtener información del correo
-                subject = decode_mime_header(msg.get('Subject', ''))
-                sender = decode_mime_header(msg.get('From', ''))
-                date = msg.get('Date', '')
-                message_id = msg.get('Message-ID', '')
+                subject = decode_mime_header(headers.get('subject', ''))
+                sender = decode_mime_header(headers.get('from', ''))
+                date = headers.get('date', '')
+                message_id = headers.get('message-id', '')
 
-                # Parsear fecha para ordenamiento
-                from email.utils import parsedate_to_datetime
+                # Parsear fecha para ordenamiento: siempre con zona horaria
+                # (MIN_DATE si no hay), "-0000" da un datetime sin ella
                 try:
-                    date_obj = parsedate_to_datetime(date) if date else None
+                    date_obj = normalize_date(parsedate_to_datetime(date) if date else None)
                 except:
-                    date_obj = None
+                    date_obj = normalize_date(None)
+
+                logger.debug("  [%d/%d] De: %s", i, len(email_ids), sender[:50])
+                logger.debug("       Asunto: %s", subject[:70])
+
+                # Cabeceras (incluyen Content-Type/-Transfer-Encoding) + cuerpo:
+                # basta para parsear el MIME igual que el mensaje completo
+                raw_email = raw_headers.rstrip(b'\r\n') + b'\r\n\r\n' + raw_text
 
-                print(f"  [{i}/{len(email_ids)}] De: {sender[:50]}")
-                print(f"       Asunto: {subject[:70]}")
+                # Sin rastro de Bandcamp en los bytes en bruto no se parsea el MIME
+                if not raw_may_contain_link(raw_email):
+                    logger.debug("       • Sin enlaces de Bandcamp")
+                    continue
 
-                # Extraer el cuerpo del correo
-                email_content = get_email_body(msg)
+                if _ENCODED_PART_RE.search(raw_email) is None:
+                    # Sin base64/quoted-printable el texto está tal cual en TEXT:
+                    # se busca ahí directamente, sin construir el árbol MIME
+                    email_content = raw_text
+                else:
+                    # Extraer el cuerpo del correo (en bytes: el enlace se busca sin decodificar)
+                    email_content = get_email_body_bytes(email.message_from_bytes(raw_email))
 
                 if not email_content:
-                    print("       ⚠️  Sin contenido")
+                    logger.debug("       ⚠️  Sin contenido")
                     continue
 
                 # Buscar enlace de Bandcamp
                 bandcamp_link = extract_bandcamp_link(email_content)
 
                 if bandcamp_link:
-                    print(f"       ✓ Enlace encontrado!")
-                    print(f"       🔗 URL completa: {bandcamp_link}")
-
-                    # Obtener el embed
-                    embed_code = get_bandcamp_embed(bandcamp_link)
-
-                    if embed_code:
-                        email_id_str = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
-
-                        embeds.append({
-                            'url': bandcamp_link,
-                            'embed': embed_code,
-                            'subject': subject,
-                            'date': date,
-                            'date_obj': date_obj,  # Para ordenar
-                            'sender': sender,
-                            'email_id': email_id_str,
-                            'message_id': message_id,
-                            'folder': folder_name,
-                            'genre': genre
-                        })
-                        print(f"       ✓ Embed obtenido ({len(embeds)} total)")
-
-                        # Marcar como leído si se encontró un enlace y la opción está activa
-                        if mark_as_read:
-                            mail.store(email_id, '+FLAGS', '\\Seen')
-                            print(f"       📖 Marcado como leído")
-
-                        # Eliminar si la opción está activa
-                        if delete_after:
-                            mail.store(email_id, '+FLAGS', '\\Deleted')
-                            print(f"       🗑️  Marcado para eliminar")
-                    else:
-                        print(f"       ⚠️  No se pudo obtener el embed")
+                    logger.debug("       ✓ Enlace encontrado: %s", bandcamp_link)
+
+                    email_id_str = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
+
+                    # El embed se obtiene después, en paralelo para toda la carpeta
+                    found.append((email_id, {
+                        'url': bandcamp_link,
+                        'embed': None,
+                        'subject': subject,
+                        'date': date,
+                        'date_obj': date_obj,  # Para ordenar
+                        'sender': sender,
+                        'email_id': email_id_str,
+                        'message_id': message_id,
+                        'folder': folder_name,
+                        'genre': genre
+                    }))
                 else:
-                    print("       • Sin enlaces de Bandcamp")
+                    logger.debug("       • Sin enlaces de Bandcamp")
 
             except Exception as e:
-                print(f"       ❌ Error procesando correo: {e}")
+                logger.warning("       ❌ Error procesando correo: %s", e)
                 continue
 
+        # Descargar los embeds en paralelo (E/S de red independiente por URL)
+        if found:
+            unique_links = list(dict.fromkeys(embed_data['url'] for _, embed_data in found))
+            print(f"\n🌐 Descargando {len(unique_links)} embeds ({max_workers} hilos)...")
+
+            embed_by_link = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(get_bandcamp_embed, link): link for link in unique_links}
+                for future in as_completed(futures):
+                    embed_by_link[futures[future]] = future.result()
+
+            for email_id, embed_data in found:
+                embed_code = embed_by_link.get(embed_data['url'])
+
+                if not embed_code:
+                    logger.warning("       ⚠️  No se pudo obtener el embed: %s", embed_data['url'])
+                    continue
+
+                embed_data['embed'] = embed_code
+                embeds.append(embed_data)
+
+                # Marcar como leído/eliminar si se encontró un embed y la opción está activa
+                if mark_as_read:
+                    to_mark_seen.append(email_id)
+                if delete_after:
+                    to_delete.append(email_id)
+
+            print(f"✓ Embeds obtenidos ({len(embeds)} total)")
+
+        # .SILENT: el servidor no devuelve un FETCH por cada mensaje
+        for flag, ids in (('\\Seen', to_mark_seen), ('\\Deleted', to_delete)):
+            for start in range(0, len(ids), store_batch_size):
+                mail.store(b','.join(ids[start:start + store_batch_size]), '+FLAGS.SILENT', flag)
+
+        if to_mark_seen:
+            print(f"\n📖 {len(to_mark_seen)} correos marcados como leídos")
+
         # Expunge para eliminar permanentemente los correos marcados
-        if delete_after:
+        if to_delete:
+            print(f"\n🗑️  {len(to_delete)} correos marcados para eliminar")
             mail.expunge()
             print(f"\n🗑️  Correos eliminados permanentemente")
 
@@ -356,7 +774,7 @@ def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_rea
         print(f"{'='*80}\n")
 
         # Ordenar por fecha (más reciente primero)
-        embeds.sort(key=lambda x: x.get('date_obj') or datetime.min, reverse=True)
+        sort_by_date(embeds)
 
     except Exception as e:
         print(f"❌ Error al procesar carpeta {folder_name}: {e}")
@@ -364,50 +782,109 @@ def process_imap_folder(mail, folder_name, genre, mark_as_read=True, include_rea
     return embeds
 
 
+def process_imap_folders(session, jobs, connections=1, **options):
+    """
+    Procesa varias carpetas en paralelo, cada una en su propia conexión IMAP
+    (la de la sesión más las adicionales, como mucho `connections`).
+    Si una carpeta aparece dos veces se procesa todo con una sola conexión:
+    dos sesiones sobre la misma carpeta se descuadrarían los números de
+    secuencia al hacer EXPUNGE.
+
+    Args:
+        session: IMAPSessionManager ya conectado
+        jobs: Lista de (carpeta, género)
+        connections: Máximo de conexiones IMAP simultáneas
+        **options: Resto de argumentos de process_imap_folder
+
+    Returns:
+        Lista con los embeds de cada carpeta, en el mismo orden que jobs
+    """
+    folder_names = [folder_name for folder_name, _ in jobs]
+    count = min(connections, len(jobs))
+    if len(set(folder_names)) < len(folder_names):
+        count = 1
+
+    pool = queue.Queue()
+    pool.put(session.get_connection())
+    if count > 1:
+        try:
+            session.get_extra_connections(count - 1)
+        except Exception as e:
+            print(f"⚠️  No se pudieron abrir todas las conexiones adicionales: {e}")
+        for mail in session.extra[:count - 1]:
+            pool.put(mail)
+
+    def run(job):
+        mail = pool.get()
+        try:
+            # La conexión puede llevar un rato parada desde la carpeta anterior
+            mail = session.ensure_alive(mail)
+            return process_imap_folder(mail, job[0], job[1], **options)
+        finally:
+            session.touch(mail)
+            pool.put(mail)
+
+    with ThreadPoolExecutor(max_workers=pool.qsize()) as executor:
+        return list(executor.map(run, jobs))
+
+
+# Patrones de enlaces de Bandcamp, en orden de prioridad
+_LINK_PATTERNS = [
+    # Patrón 1: "check it out here" con enlace en href
+    r'check\s+it\s+out\s+here.*?href=["\']([^"\']+bandcamp\.com[^"\']*)["\']',
+
+    # Patrón 2: href antes de "check it out here" (común en HTML)
+    r'href=["\']([^"\']+bandcamp\.com[^"\']*)["\'].*?check\s+it\s+out\s+here',
+
+    # Patrón 3: "check it out here" seguido de URL en texto plano
+    r'check\s+it\s+out\s+here[^\n]*?(https?://[^\s<]+bandcamp\.com[^\s<]*)',
+
+    # Patrón 4: Cualquier enlace de bandcamp en el correo (fallback)
+    r'href=["\']([^"\']*bandcamp\.com/(?:album|track)/[^"\']+)["\']',
+
+    # Patrón 5: URL directa de album/track en texto
+    r'(https?://[^\s<]+bandcamp\.com/(?:album|track)/[^\s<]+)',
+]
+
+# Compilados una sola vez, en versión str y bytes
+_LINK_REGEXES = [re.compile(p, re.IGNORECASE | re.DOTALL) for p in _LINK_PATTERNS]
+_LINK_REGEXES_BYTES = [re.compile(p.encode('ascii'), re.IGNORECASE | re.DOTALL)
+                       for p in _LINK_PATTERNS]
+
+
 def extract_bandcamp_link(email_content):
     """
     Extrae el enlace de Bandcamp del texto del correo.
     Busca diferentes patrones comunes en correos de Bandcamp.
+    Acepta str o bytes (los enlaces son ASCII, no hace falta decodificar).
     """
-    # Lista de patrones para buscar, en orden de prioridad
-    patterns = [
-        # Patrón 1: "check it out here" con enlace en href
-        r'check\s+it\s+out\s+here.*?href=["\']([^"\']+bandcamp\.com[^"\']*)["\']',
-
-        # Patrón 2: href antes de "check it out here" (común en HTML)
-        r'href=["\']([^"\']+bandcamp\.com[^"\']*)["\'].*?check\s+it\s+out\s+here',
-
-        # Patrón 3: "check it out here" seguido de URL en texto plano
-        r'check\s+it\s+out\s+here[^\n]*?(https?://[^\s<]+bandcamp\.com[^\s<]*)',
+    if not email_content:
+        return None
 
-        # Patrón 4: Cualquier enlace de bandcamp en el correo (fallback)
-        r'href=["\']([^"\']*bandcamp\.com/(?:album|track)/[^"\']+)["\']',
+    # Filtro rápido: todo enlace válido contiene "bandcamp.com" y "/album/" o
+    # "/track/" (ver el chequeo final); sin esas subcadenas no hace falta regex
+    if isinstance(email_content, bytes):
+        domain, kinds, regexes = b'bandcamp.com', (b'/album/', b'/track/'), _LINK_REGEXES_BYTES
+    else:
+        domain, kinds, regexes = 'bandcamp.com', ('/album/', '/track/'), _LINK_REGEXES
 
-        # Patrón 5: URL directa de album/track en texto
-        r'(https?://[^\s<]+bandcamp\.com/(?:album|track)/[^\s<]+)',
-    ]
+    if domain not in email_content or not any(kind in email_content for kind in kinds):
+        return None
 
-    for i, pattern in enumerate(patterns):
-        match = re.search(pattern, email_content, re.IGNORECASE | re.DOTALL)
+    for regex in regexes:
+        match = regex.search(email_content)
         if match:
             link = match.group(1)
 
-            # Limpiar el enlace
-            link = link.strip().rstrip('.,;!?>')
-
-            # Decodificar entidades HTML comunes
-            link = link.replace('&amp;', '&')
-            link = link.replace('&lt;', '<')
-            link = link.replace('&gt;', '>')
+            if isinstance(link, bytes):
+                link = link.decode('utf-8', errors='ignore')
 
-            # Limpiar parámetros de tracking pero mantener la URL base
-            # Los parámetros UTM son solo tracking, la página funciona sin ellos
-            if '?' in link:
-                base_url, params = link.split('?', 1)
-                link = base_url
+            # Decodificar entidades HTML y limpiar signos finales
+            link = unescape(link).strip().rstrip('.,;!?>')
 
-            # Eliminar cualquier cosa después de espacios o caracteres extraños
-            link = link.split()[0] if ' ' in link else link
+            # Quitar los parámetros de tracking (UTM...; la página funciona sin
+            # ellos) y cualquier cosa después de un espacio
+            link = link.partition('?')[0].partition(' ')[0]
 
             # Si el enlace es relativo, completarlo
             if link.startswith('/'):
@@ -421,356 +898,512 @@ def extract_bandcamp_link(email_content):
     return None
 
 
+# Las páginas se analizan en bytes, sin decodificar: los IDs y URLs son ASCII
+
+# Inicio de los bloques de datos de la página: "var TralbumData = {" / "var EmbedData = {"
+_DATA_BLOCK_START_RE = re.compile(rb'var\s+(TralbumData|EmbedData)\s*=\s*\{')
+_TRALBUM_START_RE = re.compile(rb'var\s+TralbumData\s*=\s*\{')
+
+# Bloque desde su "{" hasta el primer "};"
+_DATA_BLOCK_RE = re.compile(rb'(\{.+?\});', re.DOTALL)
+
+# Campos dentro de TralbumData/EmbedData (sin ".", no necesitan DOTALL)
+_ALBUM_ID_RE = re.compile(rb'"?album_id"?\s*:\s*(\d+)')
+_TRACK_ID_RE = re.compile(rb'"?track_id"?\s*:\s*(\d+)')
+_ITEM_TYPE_RE = re.compile(rb'"?item_type"?\s*:\s*"?(track|album)"?')
+_ITEM_ID_RE = re.compile(rb'"?id"?\s*:\s*(\d+)')
+
+# Búsqueda general en el HTML, en orden de prioridad. Cada patrón va con
+# las subcadenas de las que necesita al menos una: comprobarlas con "in" es
+# mucho más rápido que dejar que el regex recorra la página sin encontrar nada
+_ALBUM_ID_RES = [
+    ((b'data-item-type="album"',),
+     re.compile(rb'data-band-id="(\d+)".*?data-item-id="(\d+)".*?data-item-type="album"', re.DOTALL)),
+    ((b'album_id',), _ALBUM_ID_RE),
+    ((b'album=', b'album/'), re.compile(rb'album[=/](\d{8,12})')),
+]
+_TRACK_ID_RES = [
+    ((b'data-item-type="track"',),
+     re.compile(rb'data-band-id="(\d+)".*?data-item-id="(\d+)".*?data-item-type="track"', re.DOTALL)),
+    ((b'track_id',), _TRACK_ID_RE),
+    ((b'track=', b'track/'), re.compile(rb'track[=/](\d{8,12})')),
+]
+
+# iframe del reproductor ya incrustado en la página
+_IFRAME_RE = re.compile(rb'<iframe[^>]*src=["\']([^"\']*EmbeddedPlayer[^"\']*)["\']', re.IGNORECASE)
+
+# Código embed generado: reproductor de un álbum/track (kind, id) o una URL dada (src)
+_IFRAME_SRC_TMPL = '<iframe style="border: 0; width: 400px; height: 120px;" src="{src}" seamless></iframe>'
+_IFRAME_TMPL = _IFRAME_SRC_TMPL.format(
+    src='https://bandcamp.com/EmbeddedPlayer/{kind}={id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
+)
+
+
+def _find_data_blocks(html_content):
+    """
+    Localiza los bloques TralbumData y EmbedData en una sola pasada sobre el
+    HTML, en vez de una búsqueda completa por cada uno.
+
+    Returns:
+        Dict {"TralbumData"/"EmbedData": bytes del bloque}, primera aparición de cada uno
+    """
+    blocks = {}
+    for match in _DATA_BLOCK_START_RE.finditer(html_content):
+        name = match.group(1).decode('ascii')
+        if name in blocks:
+            continue
+
+        block = _DATA_BLOCK_RE.match(html_content, match.end() - 1)
+        if block is None:
+            # Sin "};" a partir de aquí tampoco lo habrá para los siguientes
+            break
+
+        blocks[name] = block.group(1)
+        if len(blocks) == 2:
+            break
+
+    return blocks
+
+
+def _tralbum_id(tralbum_json_str):
+    """
+    ID del reproductor dentro de un bloque TralbumData.
+
+    Returns:
+        ("album" | "track", id) o None
+    """
+    album_id_match = _ALBUM_ID_RE.search(tralbum_json_str)
+    if album_id_match:
+        return 'album', album_id_match.group(1).decode('ascii')
+
+    # Si es un track, su ID es el campo "id". Los grupos se decodifican antes de
+    # compararlos con literales str (un bytes nunca es igual a un str)
+    item_type_match = _ITEM_TYPE_RE.search(tralbum_json_str)
+    if item_type_match and item_type_match.group(1).decode('ascii') == 'track':
+        track_id_match = _ITEM_ID_RE.search(tralbum_json_str)
+        if track_id_match:
+            return 'track', track_id_match.group(1).decode('ascii')
+
+    return None
+
+
 def fetch_bandcamp_embed_from_html(html_content):
     """
     Extrae el código embed del contenido HTML de una página de Bandcamp.
     Usa múltiples métodos para encontrar los IDs necesarios.
+    Trabaja sobre bytes; si recibe str lo codifica en UTF-8.
     """
     try:
-        print(f"       📄 Analizando HTML ({len(html_content)} caracteres)")
+        if isinstance(html_content, str):
+            html_content = html_content.encode('utf-8')
+
+        logger.debug("       📄 Analizando HTML (%d bytes)", len(html_content))
+
+        # Filtro rápido: los métodos 1-3 buscan "album" o "track" literal; si no
+        # aparece ninguno de los dos en la página solo queda el iframe (método 4)
+        has_ids = b'album' in html_content or b'track' in html_content
+
+        data_blocks = _find_data_blocks(html_content) if has_ids else {}
 
         # MÉTODO 1: Buscar en el bloque TralbumData (más común)
-        tralbum_data_match = re.search(
-            r'var\s+TralbumData\s*=\s*(\{.+?\});',
-            html_content,
-            re.DOTALL
-        )
+        tralbum_json_str = data_blocks.get('TralbumData')
 
-        if tralbum_data_match:
+        if tralbum_json_str is not None:
             try:
-                tralbum_json_str = tralbum_data_match.group(1)
-
-                # Buscar album_id
-                album_id_match = re.search(r'"?album_id"?\s*:\s*(\d+)', tralbum_json_str)
-                if album_id_match:
-                    album_id = album_id_match.group(1)
-                    print(f"       ✓ album_id encontrado en TralbumData: {album_id}")
-                    embed_url = f'https://bandcamp.com/EmbeddedPlayer/album={album_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                    return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
-
-                # Buscar track_id si es un track
-                item_type_match = re.search(r'"?item_type"?\s*:\s*"?(track|album)"?', tralbum_json_str)
-                if item_type_match and item_type_match.group(1) == 'track':
-                    track_id_match = re.search(r'"?id"?\s*:\s*(\d+)', tralbum_json_str)
-                    if track_id_match:
-                        track_id = track_id_match.group(1)
-                        print(f"       ✓ track_id encontrado en TralbumData: {track_id}")
-                        embed_url = f'https://bandcamp.com/EmbeddedPlayer/track={track_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                        return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+                # Buscar album_id, o el id si es un track
+                found = _tralbum_id(tralbum_json_str)
+                if found:
+                    kind, item_id = found
+                    logger.debug("       ✓ %s_id encontrado en TralbumData: %s", kind, item_id)
+                    return _IFRAME_TMPL.format(kind=kind, id=item_id)
             except Exception as e:
-                print(f"       ⚠️  Error en TralbumData: {e}")
+                logger.debug("       ⚠️  Error en TralbumData: %s", e)
 
         # MÉTODO 2: Buscar en EmbedData
-        embed_data_match = re.search(
-            r'var\s+EmbedData\s*=\s*(\{.+?\});',
-            html_content,
-            re.DOTALL
-        )
+        embed_json_str = data_blocks.get('EmbedData')
 
-        if embed_data_match:
+        if embed_json_str is not None:
             try:
-                embed_json_str = embed_data_match.group(1)
-
-                album_id_match = re.search(r'"?album_id"?\s*:\s*(\d+)', embed_json_str)
+                album_id_match = _ALBUM_ID_RE.search(embed_json_str)
                 if album_id_match:
-                    album_id = album_id_match.group(1)
-                    print(f"       ✓ album_id encontrado en EmbedData: {album_id}")
-                    embed_url = f'https://bandcamp.com/EmbeddedPlayer/album={album_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                    return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+                    album_id = album_id_match.group(1).decode('ascii')
+                    logger.debug("       ✓ album_id encontrado en EmbedData: %s", album_id)
+                    return _IFRAME_TMPL.format(kind='album', id=album_id)
 
-                track_id_match = re.search(r'"?track_id"?\s*:\s*(\d+)', embed_json_str)
+                track_id_match = _TRACK_ID_RE.search(embed_json_str)
                 if track_id_match:
-                    track_id = track_id_match.group(1)
-                    print(f"       ✓ track_id encontrado en EmbedData: {track_id}")
-                    embed_url = f'https://bandcamp.com/EmbeddedPlayer/track={track_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                    return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+                    track_id = track_id_match.group(1).decode('ascii')
+                    logger.debug("       ✓ track_id encontrado en EmbedData: %s", track_id)
+                    return _IFRAME_TMPL.format(kind='track', id=track_id)
             except Exception as e:
-                print(f"       ⚠️  Error en EmbedData: {e}")
+                logger.debug("       ⚠️  Error en EmbedData: %s", e)
 
         # MÉTODO 3: Buscar directamente en el HTML
         # Buscar album_id en cualquier parte
-        album_id_patterns = [
-            r'data-band-id="(\d+)".*?data-item-id="(\d+)".*?data-item-type="album"',
-            r'"?album_id"?\s*:\s*(\d+)',
-            r'album[=/](\d{8,12})',
-        ]
-
-        for pattern in album_id_patterns:
-            match = re.search(pattern, html_content, re.DOTALL)
+        for literals, regex in (_ALBUM_ID_RES if has_ids else ()):
+            if not any(literal in html_content for literal in literals):
+                continue
+            match = regex.search(html_content)
             if match:
-                album_id = match.group(2) if len(match.groups()) > 1 else match.group(1)
-                print(f"       ✓ album_id encontrado (búsqueda general): {album_id}")
-                embed_url = f'https://bandcamp.com/EmbeddedPlayer/album={album_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+                album_id = (match.group(2) if len(match.groups()) > 1 else match.group(1)).decode('ascii')
+                logger.debug("       ✓ album_id encontrado (búsqueda general): %s", album_id)
+                return _IFRAME_TMPL.format(kind='album', id=album_id)
 
         # Buscar track_id
-        track_id_patterns = [
-            r'data-band-id="(\d+)".*?data-item-id="(\d+)".*?data-item-type="track"',
-            r'"?track_id"?\s*:\s*(\d+)',
-            r'track[=/](\d{8,12})',
-        ]
-
-        for pattern in track_id_patterns:
-            match = re.search(pattern, html_content, re.DOTALL)
+        for literals, regex in (_TRACK_ID_RES if has_ids else ()):
+            if not any(literal in html_content for literal in literals):
+                continue
+            match = regex.search(html_content)
             if match:
-                track_id = match.group(2) if len(match.groups()) > 1 else match.group(1)
-                print(f"       ✓ track_id encontrado (búsqueda general): {track_id}")
-                embed_url = f'https://bandcamp.com/EmbeddedPlayer/track={track_id}/size=large/bgcol=333333/linkcol=9a64ff/tracklist=false/artwork=small/transparent=true/'
-                return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+                track_id = (match.group(2) if len(match.groups()) > 1 else match.group(1)).decode('ascii')
+                logger.debug("       ✓ track_id encontrado (búsqueda general): %s", track_id)
+                return _IFRAME_TMPL.format(kind='track', id=track_id)
 
         # MÉTODO 4: Buscar el iframe embed directo
-        iframe_match = re.search(
-            r'<iframe[^>]*src=["\']([^"\']*EmbeddedPlayer[^"\']*)["\']',
-            html_content,
-            re.IGNORECASE
-        )
+        iframe_match = _IFRAME_RE.search(html_content)
         if iframe_match:
-            embed_url = iframe_match.group(1)
+            embed_url = iframe_match.group(1).decode('utf-8', errors='ignore')
             if embed_url.startswith('//'):
                 embed_url = 'https:' + embed_url
-            print(f"       ✓ iframe embed encontrado directamente")
-            return f'<iframe style="border: 0; width: 400px; height: 120px;" src="{embed_url}" seamless></iframe>'
+            logger.debug("       ✓ iframe embed encontrado directamente")
+            return _IFRAME_SRC_TMPL.format(src=embed_url)
 
-        print(f"       ❌ No se encontró embed en ningún método")
+        logger.debug("       ❌ No se encontró embed en ningún método")
 
         # Debug extra: buscar si hay contenido relevante
-        if 'album' in html_content.lower() or 'track' in html_content.lower():
-            print(f"       ℹ️  La página contiene referencias a album/track")
+        lowered = html_content.lower()
+        if b'album' in lowered or b'track' in lowered:
+            logger.debug("       ℹ️  La página contiene referencias a album/track")
 
         # Verificar si es una página válida de Bandcamp
-        if 'bandcamp' not in html_content.lower():
-            print(f"       ⚠️  La página no parece ser de Bandcamp")
+        if b'bandcamp' not in lowered:
+            logger.debug("       ⚠️  La página no parece ser de Bandcamp")
 
         # Buscar mensajes de error comunes
-        if 'not found' in html_content.lower() or '404' in html_content:
-            print(f"       ⚠️  La página muestra error 404 - el álbum no existe")
+        if b'not found' in lowered or b'404' in html_content:
+            logger.debug("       ⚠️  La página muestra error 404 - el álbum no existe")
 
-        if 'private' in html_content.lower() or 'unavailable' in html_content.lower():
-            print(f"       ⚠️  El álbum podría ser privado o no disponible")
+        if b'private' in lowered or b'unavailable' in lowered:
+            logger.debug("       ⚠️  El álbum podría ser privado o no disponible")
 
         return None
 
     except Exception as e:
-        print(f"       ❌ Error extrayendo embed: {e}")
+        logger.warning("       ❌ Error extrayendo embed: %s", e)
         return None
 
 
+# Tamaño de cada lectura al descargar una página de Bandcamp
+PAGE_CHUNK_SIZE = 32768
+
+_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+               '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+# Una sola sesión para todas las descargas: sin un handshake TCP+TLS por página
+if requests is not None:
+    _SESSION = requests.Session()
+    _SESSION.headers['User-Agent'] = _USER_AGENT
+    _SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=EMBED_FETCH_WORKERS))
+else:
+    _SESSION = None
+
+
+def _read_page(chunks, drain=False):
+    """
+    Junta los bloques de una descarga y deja de acumular en cuanto el primer
+    TralbumData está completo y tiene un ID: el método 1 de
+    fetch_bandcamp_embed_from_html tiene prioridad, así que el resto de la
+    página ya no cambia el embed.
+
+    Con drain=True el resto de bloques se leen y se descartan en vez de cortar
+    la descarga: una respuesta a medio leer cierra la conexión y la sesión
+    keep-alive no podría reutilizarla.
+
+    Returns:
+        Contenido en bytes (entero, o hasta el final de ese TralbumData)
+    """
+    buf = bytearray()
+    block_start = None
+    checking = True
+    found = False
+
+    for chunk in chunks:
+        if found:
+            continue
+
+        scanned = len(buf)
+        buf += chunk
+        if not checking:
+            continue
+
+        if block_start is None:
+            # El marcador puede haber quedado partido entre dos bloques
+            match = _TRALBUM_START_RE.search(buf, max(0, scanned - 256))
+            if match is None:
+                continue
+            block_start = match.end() - 1
+
+        # Como _DATA_BLOCK_RE: el bloque acaba en el primer "};"
+        block_end = buf.find(b'};', max(block_start + 2, scanned - 1))
+        if block_end == -1:
+            continue
+
+        if _tralbum_id(bytes(buf[block_start:block_end + 1])):
+            if not drain:
+                break
+            found = True
+            continue
+
+        # TralbumData sin ID: hacen falta los demás métodos, página completa
+        checking = False
+
+    return bytes(buf)
+
+
+def _download_page(url):
+    """
+    Descarga una página y devuelve (código HTTP, contenido en bytes).
+    Se lee por bloques de PAGE_CHUNK_SIZE y solo se analiza hasta donde basta
+    (ver _read_page). Con requests instalado reutiliza las conexiones de
+    _SESSION, así que la respuesta se lee entera para devolver la conexión al
+    pool; urllib abre una nueva cada vez y ahí sí se corta la descarga. En los dos casos los errores se lanzan como
+    urllib.error.HTTPError / URLError.
+    """
+    if _SESSION is not None:
+        try:
+            with _SESSION.get(url, timeout=15, stream=True) as response:
+                if response.status_code >= 400:
+                    raise urllib.error.HTTPError(url, response.status_code, response.reason,
+                                                 response.headers, None)
+                return response.status_code, _read_page(response.iter_content(PAGE_CHUNK_SIZE),
+                                                        drain=True)
+        except requests.RequestException as e:
+            raise urllib.error.URLError(e)
+
+    req = urllib.request.Request(url, headers={'User-Agent': _USER_AGENT})
+    with urllib.request.urlopen(req, timeout=15) as response:
+        return response.status, _read_page(iter(lambda: response.read(PAGE_CHUNK_SIZE), b''))
+
+
+# Embeds obtenidos por URL, guardados entre ejecuciones en EMBED_CACHE_FILE
+EMBED_CACHE_FILE = '.bc_embed_cache.json'
+_embed_cache = {}
+_embed_cache_loaded = 0
+
+
+def load_embed_cache(cache_file=EMBED_CACHE_FILE):
+    """Carga los embeds guardados en ejecuciones anteriores"""
+    global _embed_cache_loaded
+
+    if not os.path.exists(cache_file):
+        return
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            _embed_cache.update(json.load(f))
+    except (json.JSONDecodeError, IOError):
+        print(f"⚠️  Error al leer {cache_file}, se ignora")
+    _embed_cache_loaded = len(_embed_cache)
+
+
+def save_embed_cache(cache_file=EMBED_CACHE_FILE):
+    """Guarda los embeds (solo si se ha obtenido alguno nuevo)"""
+    if len(_embed_cache) == _embed_cache_loaded:
+        return
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(_embed_cache, f, ensure_ascii=False, separators=(',', ':'))
+    except IOError as e:
+        print(f"⚠️  No se pudo guardar {cache_file}: {e}")
+
+
 def get_bandcamp_embed(url, retry_count=3):
     """
     Obtiene el código embed de Bandcamp para una URL dada.
     Intenta varias veces en caso de error.
+    Memoizado por URL en _embed_cache, solo si hay embed: los reenvíos/promos
+    repetidos se descargan una vez, los cargados con load_embed_cache() no se
+    vuelven a descargar, y un fallo pasajero (timeout, 5xx) se reintenta en la
+    siguiente carpeta en vez de quedar guardado como None.
     """
+    embed = _embed_cache.get(url)
+    if embed:
+        return embed
+
     for attempt in range(retry_count):
         try:
             if attempt > 0:
-                print(f"       🔄 Reintento {attempt + 1}/{retry_count}...")
+                logger.debug("       🔄 Reintento %d/%d...", attempt + 1, retry_count)
                 time.sleep(2)
 
-            req = urllib.request.Request(
-                url,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-            )
-
-            with urllib.request.urlopen(req, timeout=15) as response:
-                html = response.read().decode('utf-8', errors='ignore')
-                print(f"       ✓ Página descargada (código {response.status})")
+            # Sin decodificar: el análisis se hace sobre bytes
+            status, html = _download_page(url)
+            logger.debug("       ✓ Página descargada (código %s)", status)
 
             embed = fetch_bandcamp_embed_from_html(html)
 
             if embed:
+                _embed_cache[url] = embed
                 return embed
             else:
-                print(f"       ⚠️  No se encontró embed en intento {attempt + 1}")
+                logger.debug("       ⚠️  No se encontró embed en intento %d", attempt + 1)
 
         except urllib.error.HTTPError as e:
-            print(f"       ❌ Error HTTP {e.code}: {e.reason}")
+            logger.debug("       ❌ Error HTTP %s: %s", e.code, e.reason)
             if e.code == 404:
-                print(f"       ℹ️  La página no existe (404)")
+                logger.debug("       ℹ️  La página no existe (404)")
                 return None
             elif e.code >= 500:
-                print(f"       ℹ️  Error del servidor, reintentando...")
+                logger.debug("       ℹ️  Error del servidor, reintentando...")
         except urllib.error.URLError as e:
-            print(f"       ❌ Error de conexión: {e.reason}")
+            logger.debug("       ❌ Error de conexión: %s", e.reason)
         except Exception as e:
-            print(f"       ❌ Error inesperado: {type(e).__name__}: {e}")
+            logger.debug("       ❌ Error inesperado: %s: %s", type(e).__name__, e)
 
-    print(f"       ❌ Falló después de {retry_count} intentos")
+    logger.debug("       ❌ Falló después de %d intentos", retry_count)
     return None
 
 
-def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_page=10):
+def imap_metadata_json(config):
     """
-    Genera un archivo HTML para un género específico con botones de acción.
-    Incluye API para marcar como leído y eliminar correos.
-    Los embeds se ordenan por fecha del correo (más reciente primero).
+    Datos de conexión (sin contraseña) que usa el API de las páginas, en JSON.
     """
-    # Ordenar embeds por fecha (más reciente primero)
-    # Los que no tienen date_obj van al final
-    embeds_sorted = sorted(
-        embeds,
-        key=lambda x: x.get('date_obj') or datetime.min,
-        reverse=True  # Más reciente primero
-    )
-
-    # Sanitizar el nombre del archivo
-    safe_genre = re.sub(r'[^\w\s-]', '', genre).strip().replace(' ', '_')
-    filename = f"{safe_genre}.html"
-
-    total_items = len(embeds_sorted)
-    total_pages = (total_items + items_per_page - 1) // items_per_page
-
-    # Guardar metadata de conexión para el API
     metadata = {
         'server': config.server,
         'port': config.port,
         'email': config.email
     }
+    if orjson is not None:
+        return orjson.dumps(metadata).decode('utf-8')
+    return json.dumps(metadata)
 
-    metadata_json = json.dumps(metadata)
 
-    # Generar los embeds HTML con botones
-    embeds_html = ""
-    for i, embed_data in enumerate(embeds_sorted):
-        page_num = (i // items_per_page) + 1
-        page_class = f"page-{page_num}" if total_pages > 1 else ""
+# Caracteres que se quitan del género para formar el nombre del archivo
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w\s-]')
 
-        # Crear identificador único para este embed
-        embed_id = f"embed_{i}"
-        email_id = embed_data.get('email_id', '')
-        folder = embed_data.get('folder', '')
+# Caracteres que html.escape sustituye (con quote=True)
+_NEEDS_ESCAPE_RE = re.compile(r'[&<>"\']')
 
-        embeds_html += f"""
-        <div class="embed-item {page_class}" data-page="{page_num}" id="{embed_id}">
-            {embed_data['embed']}
-            <div class="embed-info">
-                <strong>{escape(embed_data.get('subject', 'Sin título'))}</strong><br>
-                <small>📅 {escape(embed_data.get('date', 'Fecha desconocida'))}</small>
-            </div>
-            <div class="embed-actions">
-                <button class="action-btn mark-read-btn" onclick="markAsRead('{embed_id}', '{email_id}', '{folder}')">
-                    📖 Marcar como leído
-                </button>
-                <button class="action-btn delete-btn" onclick="deleteEmail('{embed_id}', '{email_id}', '{folder}')">
-                    🗑️ Eliminar
-                </button>
-            </div>
-        </div>
-        """
 
-    # Generar controles de paginación
-    pagination_html = ""
-    if total_pages > 1:
-        pagination_html = '<div class="pagination">'
-        for page in range(1, total_pages + 1):
-            active = "active" if page == 1 else ""
-            pagination_html += f'<button class="page-btn {active}" data-page="{page}">Página {page}</button>'
-        pagination_html += '</div>'
-
-    # HTML completo con API y estilos
-    html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🎵 {escape(genre)} - Bandcamp Collection</title>
-    <style>
-        * {{
+def _esc(text):
+    """
+    html.escape con atajo: la mayoría de asuntos, fechas y géneros no tienen
+    nada que escapar y se devuelven tal cual, sin las cinco sustituciones.
+    """
+    if not text:
+        return ''
+    if _NEEDS_ESCAPE_RE.search(text) is None:
+        return text
+    return escape(text)
+
+
+# Búfer de escritura de las páginas de género: las escrituras pequeñas de
+# cada embed se agrupan en pocas llamadas al sistema
+PAGE_WRITE_BUFFER = 1 << 20
+
+# Nivel de compresión de las copias .gz de las páginas (--gzip)
+GZIP_LEVEL = 6
+
+# Botón de paginación: (clase "active" o vacía, página, página)
+_PAGE_BUTTON_TMPL = '<button class="page-btn %s" data-page="%d">Página %d</button>'
+
+# Partes fijas de las páginas de género (iguales para todos los géneros):
+# se definen una vez y solo se interpolan los datos de cada página
+_GENRE_PAGE_STYLE = """    <style>
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
-        }}
+        }
 
-        header {{
+        header {
             background: rgba(255, 255, 255, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 20px;
             padding: 30px;
             margin-bottom: 30px;
             box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
-        }}
+        }
 
-        h1 {{
+        h1 {
             color: #333;
             font-size: 2.5em;
             margin-bottom: 10px;
-        }}
+        }
 
-        .subtitle {{
+        .subtitle {
             color: #666;
             font-size: 1.1em;
-        }}
+        }
 
-        .back-link {{
+        .back-link {
             display: inline-block;
             margin-top: 15px;
             color: #667eea;
             text-decoration: none;
             font-weight: 500;
             transition: color 0.3s;
-        }}
+        }
 
-        .back-link:hover {{
+        .back-link:hover {
             color: #764ba2;
-        }}
+        }
 
-        .embeds-grid {{
+        .embeds-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(400px, 1fr));
             gap: 25px;
             margin-bottom: 30px;
-        }}
+        }
 
-        .embed-item {{
+        .embed-item {
             background: rgba(255, 255, 255, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 15px;
             padding: 20px;
             box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
             transition: transform 0.3s, box-shadow 0.3s, opacity 0.3s;
-        }}
+        }
 
-        .embed-item:hover {{
+        .embed-item:hover {
             transform: translateY(-5px);
             box-shadow: 0 10px 30px rgba(0, 0, 0, 0.15);
-        }}
+        }
 
-        .embed-item.hidden {{
+        .page[hidden] {
             display: none;
-        }}
+        }
 
-        .embed-item.removed {{
+        .embed-item.removed {
             opacity: 0.3;
             pointer-events: none;
-        }}
+        }
 
-        .embed-info {{
+        .embed-info {
             margin-top: 15px;
             color: #555;
             font-size: 0.9em;
-        }}
+        }
 
-        .embed-actions {{
+        .embed-actions {
             margin-top: 15px;
             display: flex;
             gap: 10px;
             flex-wrap: wrap;
-        }}
+        }
 
-        .action-btn {{
+        .action-btn {
             flex: 1;
             min-width: 150px;
             padding: 10px 15px;
@@ -780,49 +1413,49 @@ def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_pa
             font-weight: 500;
             font-size: 0.9em;
             transition: all 0.3s;
-        }}
+        }
 
-        .mark-read-btn {{
+        .mark-read-btn {
             background: #4CAF50;
             color: white;
-        }}
+        }
 
-        .mark-read-btn:hover {{
+        .mark-read-btn:hover {
             background: #45a049;
             transform: translateY(-2px);
-        }}
+        }
 
-        .mark-read-btn:disabled {{
+        .mark-read-btn:disabled {
             background: #ccc;
             cursor: not-allowed;
             transform: none;
-        }}
+        }
 
-        .delete-btn {{
+        .delete-btn {
             background: #f44336;
             color: white;
-        }}
+        }
 
-        .delete-btn:hover {{
+        .delete-btn:hover {
             background: #da190b;
             transform: translateY(-2px);
-        }}
+        }
 
-        .delete-btn:disabled {{
+        .delete-btn:disabled {
             background: #ccc;
             cursor: not-allowed;
             transform: none;
-        }}
+        }
 
-        .pagination {{
+        .pagination {
             display: flex;
             justify-content: center;
             gap: 10px;
             flex-wrap: wrap;
             margin-top: 30px;
-        }}
+        }
 
-        .page-btn {{
+        .page-btn {
             background: rgba(255, 255, 255, 0.95);
             border: 2px solid #667eea;
             color: #667eea;
@@ -831,19 +1464,19 @@ def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_pa
             cursor: pointer;
             font-weight: 500;
             transition: all 0.3s;
-        }}
+        }
 
-        .page-btn:hover {{
+        .page-btn:hover {
             background: #667eea;
             color: white;
-        }}
+        }
 
-        .page-btn.active {{
+        .page-btn.active {
             background: #667eea;
             color: white;
-        }}
+        }
 
-        .notification {{
+        .notification {
             position: fixed;
             top: 20px;
             right: 20px;
@@ -854,155 +1487,143 @@ def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_pa
             z-index: 1000;
             display: none;
             animation: slideIn 0.3s ease;
-        }}
+        }
 
-        .notification.show {{
+        .notification.show {
             display: block;
-        }}
+        }
 
-        .notification.success {{
+        .notification.success {
             border-left: 4px solid #4CAF50;
-        }}
+        }
 
-        .notification.error {{
+        .notification.error {
             border-left: 4px solid #f44336;
-        }}
+        }
 
-        @keyframes slideIn {{
-            from {{
+        @keyframes slideIn {
+            from {
                 transform: translateX(400px);
                 opacity: 0;
-            }}
-            to {{
+            }
+            to {
                 transform: translateX(0);
                 opacity: 1;
-            }}
-        }}
+            }
+        }
 
-        @media (max-width: 768px) {{
-            .embeds-grid {{
+        @media (max-width: 768px) {
+            .embeds-grid {
                 grid-template-columns: 1fr;
-            }}
+            }
 
-            h1 {{
+            h1 {
                 font-size: 2em;
-            }}
+            }
 
-            .action-btn {{
+            .action-btn {
                 min-width: 100%;
-            }}
-        }}
+            }
+        }
     </style>
-</head>
-<body>
-    <div class="container">
-        <header>
-            <h1>🎵 {escape(genre)}</h1>
-            <p class="subtitle">📀 {total_items} disco{"s" if total_items != 1 else ""}</p>
-            <a href="index.html" class="back-link">← Volver al índice</a>
-        </header>
-
-        <div class="embeds-grid">
-            {embeds_html}
-        </div>
-
-        {pagination_html}
-    </div>
+"""
 
-    <div id="notification" class="notification"></div>
+_GENRE_PAGE_SCRIPT = """        // Paginación: cada página es un contenedor .page que se muestra/oculta entero
+        const pageButtons = document.querySelectorAll('.page-btn');
+        const pages = document.querySelectorAll('.page');
 
-    <script>
-        // Configuración de conexión IMAP
-        const imapConfig = {metadata_json};
+        // Un solo listener para todos los botones de página (delegación)
+        const pagination = document.querySelector('.pagination');
 
-        // Paginación
-        const pageButtons = document.querySelectorAll('.page-btn');
-        const embedItems = document.querySelectorAll('.embed-item');
+        if (pagination) {
+            pagination.addEventListener('click', event => {
+                const button = event.target.closest('.page-btn');
+                if (!button) return;
 
-        pageButtons.forEach(button => {{
-            button.addEventListener('click', () => {{
                 const page = button.dataset.page;
 
                 pageButtons.forEach(btn => btn.classList.remove('active'));
                 button.classList.add('active');
 
-                embedItems.forEach(item => {{
-                    if (item.dataset.page === page) {{
-                        item.classList.remove('hidden');
-                    }} else {{
-                        item.classList.add('hidden');
-                    }}
-                }});
-
-                window.scrollTo({{ top: 0, behavior: 'smooth' }});
-            }});
-        }});
-
-        // Mostrar solo la primera página al cargar
-        if (pageButtons.length > 0) {{
-            embedItems.forEach(item => {{
-                if (item.dataset.page !== '1') {{
-                    item.classList.add('hidden');
-                }}
-            }});
-        }}
+                pages.forEach(container => {
+                    container.hidden = container.dataset.page !== page;
+                });
+
+                window.scrollTo({ top: 0, behavior: 'smooth' });
+            });
+        }
+
+        // Botones de acción: un listener en el contenedor para todos los embeds;
+        // el correo y la carpeta se leen de los data-* del embed
+        document.querySelector('.container').addEventListener('click', event => {
+            const button = event.target.closest('.action-btn');
+            if (!button) return;
+
+            const item = button.closest('.embed-item');
+
+            if (button.classList.contains('mark-read-btn')) {
+                markAsRead(item.id, item.dataset.emailId, item.dataset.folder);
+            } else if (button.classList.contains('delete-btn')) {
+                deleteEmail(item.id, item.dataset.emailId, item.dataset.folder);
+            }
+        });
 
         // Funciones de notificación
-        function showNotification(message, type = 'success') {{
+        function showNotification(message, type = 'success') {
             const notification = document.getElementById('notification');
             notification.textContent = message;
-            notification.className = `notification show ${{type}}`;
+            notification.className = `notification show ${type}`;
 
-            setTimeout(() => {{
+            setTimeout(() => {
                 notification.classList.remove('show');
-            }}, 3000);
-        }}
+            }, 3000);
+        }
 
         // Función para marcar como leído
-        async function markAsRead(embedId, emailId, folder) {{
+        async function markAsRead(embedId, emailId, folder) {
             const embedElement = document.getElementById(embedId);
             const button = embedElement.querySelector('.mark-read-btn');
 
             button.disabled = true;
             button.textContent = '⏳ Procesando...';
 
-            try {{
+            try {
                 // Aquí llamarías a tu API backend
                 // Por ahora simulamos la operación
-                const response = await fetch('/api/mark-read', {{
+                const response = await fetch('/api/mark-read', {
                     method: 'POST',
-                    headers: {{
+                    headers: {
                         'Content-Type': 'application/json',
-                    }},
-                    body: JSON.stringify({{
+                    },
+                    body: JSON.stringify({
                         server: imapConfig.server,
                         port: imapConfig.port,
                         email: imapConfig.email,
                         emailId: emailId,
                         folder: folder
-                    }})
-                }});
+                    })
+                });
 
-                if (response.ok) {{
+                if (response.ok) {
                     button.textContent = '✓ Leído';
                     button.style.background = '#95d5b2';
                     showNotification('Correo marcado como leído', 'success');
-                }} else {{
+                } else {
                     throw new Error('Error al marcar como leído');
-                }}
-            }} catch (error) {{
+                }
+            } catch (error) {
                 console.error('Error:', error);
                 button.disabled = false;
                 button.textContent = '📖 Marcar como leído';
                 showNotification('Error: ' + error.message + ' (API no disponible)', 'error');
-            }}
-        }}
+            }
+        }
 
         // Función para eliminar
-        async function deleteEmail(embedId, emailId, folder) {{
-            if (!confirm('¿Estás seguro de que quieres eliminar este correo? Esta acción no se puede deshacer.')) {{
+        async function deleteEmail(embedId, emailId, folder) {
+            if (!confirm('¿Estás seguro de que quieres eliminar este correo? Esta acción no se puede deshacer.')) {
                 return;
-            }}
+            }
 
             const embedElement = document.getElementById(embedId);
             const button = embedElement.querySelector('.delete-btn');
@@ -1010,52 +1631,179 @@ def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_pa
             button.disabled = true;
             button.textContent = '⏳ Eliminando...';
 
-            try {{
+            try {
                 // Aquí llamarías a tu API backend
-                const response = await fetch('/api/delete-email', {{
+                const response = await fetch('/api/delete-email', {
                     method: 'POST',
-                    headers: {{
+                    headers: {
                         'Content-Type': 'application/json',
-                    }},
-                    body: JSON.stringify({{
+                    },
+                    body: JSON.stringify({
                         server: imapConfig.server,
                         port: imapConfig.port,
                         email: imapConfig.email,
                         emailId: emailId,
                         folder: folder
-                    }})
-                }});
+                    })
+                });
 
-                if (response.ok) {{
+                if (response.ok) {
                     embedElement.classList.add('removed');
                     button.textContent = '✓ Eliminado';
                     showNotification('Correo eliminado', 'success');
 
-                    setTimeout(() => {{
+                    setTimeout(() => {
                         embedElement.style.display = 'none';
-                    }}, 1000);
-                }} else {{
+                    }, 1000);
+                } else {
                     throw new Error('Error al eliminar');
-                }}
-            }} catch (error) {{
+                }
+            } catch (error) {
                 console.error('Error:', error);
                 button.disabled = false;
                 button.textContent = '🗑️ Eliminar';
                 showNotification('Error: ' + error.message + ' (API no disponible)', 'error');
-            }}
-        }}
+            }
+        }
 
         // Aviso sobre el API
         console.log('%c⚠️ NOTA: Los botones de acción requieren un servidor API backend', 'color: orange; font-size: 14px; font-weight: bold');
         console.log('Para implementar la funcionalidad completa, necesitas crear un servidor que maneje las peticiones /api/mark-read y /api/delete-email');
-    </script>
-</body>
-</html>
 """
 
+
+def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_page=10, metadata_json=None,
+                                 gzip_output=False):
+    """
+    Genera un archivo HTML para un género específico con botones de acción.
+    Incluye API para marcar como leído y eliminar correos.
+    Los embeds se ordenan por fecha del correo (más reciente primero).
+    metadata_json: datos de conexión ya serializados (igual para todos los
+    géneros); si no se indica se obtiene de config.
+    gzip_output: escribe además una copia comprimida (<archivo>.html.gz)
+    para servirla precomprimida.
+    """
+    # Ordenar embeds por fecha (más reciente primero); los que no tienen
+    # fecha llevan MIN_DATE y van al final
+    embeds_sorted = list(embeds)
+    sort_by_date(embeds_sorted)
+
+    # Sanitizar el nombre del archivo
+    safe_genre = _UNSAFE_FILENAME_RE.sub('', genre).strip().replace(' ', '_')
+    filename = f"{safe_genre}.html"
+
+    total_items = len(embeds_sorted)
+    total_pages = (total_items + items_per_page - 1) // items_per_page
+
+    # Guardar metadata de conexión para el API
+    if metadata_json is None:
+        metadata_json = imap_metadata_json(config)
+    genre_html = _esc(genre)
+
+    # Generar controles de paginación
+    pagination_html = ""
+    if total_pages > 1:
+        pagination_html = '<div class="pagination">' + ''.join(
+            _PAGE_BUTTON_TMPL % ("active" if page == 1 else "", page, page)
+            for page in range(1, total_pages + 1)
+        ) + '</div>'
+
+    # El HTML se escribe en el archivo a medida que se genera, sin construir
+    # el documento completo en memoria; el búfer grande agrupa las escrituras
     filepath = os.path.join(output_dir, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html)
+    gz_file = (gzip.open(filepath + '.gz', 'wt', encoding='utf-8', compresslevel=GZIP_LEVEL)
+               if gzip_output else nullcontext())
+    with open(filepath, 'w', encoding='utf-8', buffering=PAGE_WRITE_BUFFER) as f, gz_file as gz:
+        if gz is None:
+            write = f.write
+        else:
+            # Cada trozo va a los dos archivos: se comprime mientras se escribe
+            def write(text):
+                f.write(text)
+                gz.write(text)
+
+        # Cabecera con estilos
+        write(f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🎵 {genre_html} - Bandcamp Collection</title>
+{_GENRE_PAGE_STYLE}</head>
+<body>
+    <div class="container">
+        <header>
+            <h1>🎵 {genre_html}</h1>
+            <p class="subtitle">📀 {total_items} disco{"s" if total_items != 1 else ""}</p>
+            <a href="index.html" class="back-link">← Volver al índice</a>
+        </header>
+
+        """)
+
+        # Embeds con botones, un contenedor por página: las páginas distintas
+        # de la primera salen ya ocultas (atributo hidden) y el navegador no
+        # las maqueta hasta que se muestran
+        for i, embed_data in enumerate(embeds_sorted):
+            page_num = (i // items_per_page) + 1
+            if i % items_per_page == 0:
+                if i:
+                    write("""
+        </div>
+""")
+                write(f"""
+        <div class="embeds-grid page" data-page="{page_num}"{" hidden" if page_num > 1 else ""}>
+""")
+
+            # Crear identificador único para este embed
+            embed_id = f"embed_{i}"
+            email_id = embed_data.get('email_id', '')
+            folder = embed_data.get('folder', '')
+
+            # Carga diferida: el navegador solo abre los reproductores visibles
+            # (los de páginas ocultas no se piden hasta mostrarlas)
+            embed_html = embed_data['embed']
+            if 'loading=' not in embed_html:
+                embed_html = embed_html.replace('<iframe ', '<iframe loading="lazy" ', 1)
+
+            write(f"""
+        <div class="embed-item" id="{embed_id}" data-email-id="{_esc(email_id)}" data-folder="{_esc(folder)}">
+            {embed_html}
+            <div class="embed-info">
+                <strong>{_esc(embed_data.get('subject', 'Sin título'))}</strong><br>
+                <small>📅 {_esc(embed_data.get('date', 'Fecha desconocida'))}</small>
+            </div>
+            <div class="embed-actions">
+                <button class="action-btn mark-read-btn">
+                    📖 Marcar como leído
+                </button>
+                <button class="action-btn delete-btn">
+                    🗑️ Eliminar
+                </button>
+            </div>
+        </div>
+        """)
+
+        if embeds_sorted:
+            write("""
+        </div>
+""")
+
+        # Paginación y script con el API
+        write(f"""
+
+        {pagination_html}
+    </div>
+
+    <div id="notification" class="notification"></div>
+
+    <script>
+        // Configuración de conexión IMAP
+        const imapConfig = {metadata_json};
+
+{_GENRE_PAGE_SCRIPT}    </script>
+</body>
+</html>
+""")
 
     print(f"      ✓ {filename} generado con botones de acción")
     return filename
@@ -1064,7 +1812,18 @@ def generate_genre_html_with_api(genre, embeds, output_dir, config, items_per_pa
 def interactive_setup():
     """
     Modo interactivo para configurar la conexión IMAP.
+    Si están definidas BCIMAP_SERVER, BCIMAP_EMAIL y BCIMAP_PASSWORD (y
+    opcionalmente BCIMAP_PORT) se usan sin preguntar nada.
     """
+    import getpass
+
+    env_server = os.environ.get('BCIMAP_SERVER')
+    env_email = os.environ.get('BCIMAP_EMAIL')
+    env_password = os.environ.get('BCIMAP_PASSWORD')
+    if env_server and env_email and env_password:
+        print(f"🔧 Configuración IMAP desde el entorno: {env_email} en {env_server}")
+        return IMAPConfig(env_server, int(os.environ.get('BCIMAP_PORT') or 993), env_email, env_password)
+
     print("\n" + "="*80)
     print("🔧 CONFIGURACIÓN IMAP")
     print("="*80 + "\n")
@@ -1099,9 +1858,18 @@ def interactive_setup():
         port = input("Puerto (default: 993): ").strip() or "993"
         email_address = input("Email: ").strip()
 
-    password = getpass.getpass("Contraseña: ")
+    remember_password = False
+    password = get_saved_password(server, email_address)
+    if password:
+        print("🔐 Usando la contraseña guardada en el llavero del sistema")
+    else:
+        password = getpass.getpass("Contraseña: ")
+        if keyring is not None:
+            remember = input("¿Guardar la contraseña en el llavero del sistema? (s/n): ")
+            remember_password = remember.strip().lower() == 's'
 
-    return IMAPConfig(server, int(port), email_address, password)
+    return IMAPConfig(server, int(port), email_address, password,
+                      remember_password=remember_password)
 
 
 def main():
@@ -1116,10 +1884,16 @@ def main():
     parser.add_argument('--port', type=int, default=993, help='Puerto IMAP (default: 993)')
     parser.add_argument('--email', help='Dirección de email')
     parser.add_argument('--password', help='Contraseña (no recomendado, usa --interactive)')
+    parser.add_argument('--remember-password', action='store_true',
+                       help='Guardar la contraseña en el llavero del sistema tras un login '
+                            'correcto (necesita keyring)')
 
     # Opciones de operación
     parser.add_argument('--list-folders', action='store_true',
                        help='Listar todas las carpetas disponibles y salir')
+    parser.add_argument('--refresh-folders', action='store_true',
+                       help=f'Volver a pedir la lista de carpetas al servidor aunque la guardada '
+                            f'tenga menos de {FOLDER_CACHE_TTL // 60} minutos')
     parser.add_argument('--folders', nargs='+',
                        help='Carpetas en formato "ruta:género" (ej: "INBOX/Rock:Rock")')
     parser.add_argument('--no-mark-read', action='store_true',
@@ -1128,23 +1902,54 @@ def main():
                        help='Incluir correos ya leídos (por defecto solo procesa no leídos)')
     parser.add_argument('--delete', action='store_true',
                        help='Eliminar correos después de procesarlos (¡CUIDADO!)')
+    parser.add_argument('--search-from', default=SEARCH_FROM,
+                       help=f'Procesar solo correos cuyo remitente contiene este texto; '
+                            f'"" para no filtrar (default: {SEARCH_FROM})')
+    parser.add_argument('--fetch-batch-size', type=int, default=FETCH_BATCH_SIZE,
+                       help=f'Correos por cada FETCH IMAP; bájalo si el servidor rechaza '
+                            f'peticiones grandes (default: {FETCH_BATCH_SIZE})')
+    parser.add_argument('--store-batch-size', type=int, default=STORE_BATCH_SIZE,
+                       help=f'Correos por cada STORE al marcar como leídos/eliminados '
+                            f'(default: {STORE_BATCH_SIZE})')
+    parser.add_argument('--imap-connections', type=int, default=IMAP_CONNECTIONS,
+                       help=f'Conexiones IMAP para procesar carpetas en paralelo, como mucho una '
+                            f'por carpeta (default: {IMAP_CONNECTIONS})')
+    parser.add_argument('--workers', type=int, default=EMBED_FETCH_WORKERS,
+                       help=f'Descargas simultáneas de embeds por carpeta (default: {EMBED_FETCH_WORKERS})')
 
     # Opciones de salida
     parser.add_argument('--output-dir', default='bandcamp_html',
                        help='Directorio de salida para los archivos HTML (default: bandcamp_html)')
     parser.add_argument('--items-per-page', type=int, default=10,
                        help='Número de discos por página en cada género (default: 10)')
+    parser.add_argument('--gzip', action='store_true',
+                       help='Escribir también una copia .html.gz de cada página, para servirla precomprimida')
+    parser.add_argument('--html-workers', type=int, default=1,
+                       help='Procesos para generar los HTML de varios géneros a la vez; '
+                            'solo compensa con muchos géneros grandes (default: 1)')
+    parser.add_argument('--embed-cache-file', default=EMBED_CACHE_FILE,
+                       help=f'Embeds de Bandcamp ya descargados, por URL (default: {EMBED_CACHE_FILE})')
+
+    # Opciones de salida por consola
+    parser.add_argument('--verbose', action='store_true',
+                       help='Mostrar el detalle de cada correo y página procesados')
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(message)s', stream=sys.stdout)
+
     # Configurar conexión IMAP
     if args.interactive:
         config = interactive_setup()
+        config.remember_password = config.remember_password or args.remember_password
     elif args.server and args.email:
-        password = args.password
+        password = args.password or get_saved_password(args.server, args.email)
         if not password:
+            import getpass
             password = getpass.getpass(f"Contraseña para {args.email}: ")
-        config = IMAPConfig(args.server, args.port, args.email, password)
+        config = IMAPConfig(args.server, args.port, args.email, password,
+                            remember_password=args.remember_password)
     else:
         print("❌ Debes usar --interactive o proporcionar --server y --email")
         print("Usa --help para ver ejemplos de uso")
@@ -1165,9 +1970,10 @@ def main():
             print("\n" + "="*80)
             print("📁 CARPETAS DISPONIBLES")
             print("="*80 + "\n")
-            folders = get_imap_folders(mail)
-            for i, folder in enumerate(folders, 1):
-                print(f"  {i}. {folder}")
+            folders = get_folders_cached(mail, refresh=args.refresh_folders)
+            # Una sola escritura para toda la lista (puede haber cientos)
+            if folders:
+                print('\n'.join(f"  {i}. {folder}" for i, folder in enumerate(folders, 1)))
             print(f"\n📊 Total: {len(folders)} carpetas")
             print("\nUsa estas carpetas con --folders \"carpeta:género\"")
             return
@@ -1178,7 +1984,7 @@ def main():
             print("Ejemplo: --folders \"INBOX:Rock\" \"Sent:Electronic\"")
             return
 
-        embeds_by_genre = defaultdict(list)
+        embeds_by_genre = {}
         mark_as_read = not args.no_mark_read
         include_read = args.include_read
         delete_after = args.delete
@@ -1189,69 +1995,119 @@ def main():
                 print("Operación cancelada")
                 return
 
-        print(f"\n{'='*80}")
-        print(f"📧 PROCESANDO CORREOS")
-        print(f"{'='*80}")
-        print(f"Servidor: {config.server}")
-        print(f"Email: {config.email}")
-        print(f"Marcar como leídos: {'Sí' if mark_as_read else 'No'}")
-        print(f"Incluir ya leídos: {'Sí' if include_read else 'No'}")
-        print(f"Eliminar correos: {'Sí' if delete_after else 'No'}")
-        print(f"{'='*80}\n")
-
+        # Cada bloque de resumen se escribe de una vez
+        print(f"""
+{'='*80}
+📧 PROCESANDO CORREOS
+{'='*80}
+Servidor: {config.server}
+Email: {config.email}
+Marcar como leídos: {'Sí' if mark_as_read else 'No'}
+Incluir ya leídos: {'Sí' if include_read else 'No'}
+Eliminar correos: {'Sí' if delete_after else 'No'}
+Filtro de remitente: {args.search_from or 'Ninguno'}
+{'='*80}
+""")
+
+        # Embeds de ejecuciones anteriores: esas URLs no se vuelven a descargar
+        load_embed_cache(args.embed_cache_file)
+
+        jobs = []
         for folder_spec in args.folders:
             if ':' in folder_spec:
                 folder_name, genre = folder_spec.rsplit(':', 1)
             else:
                 folder_name = folder_spec
                 genre = folder_name.split('/')[-1]
-
-            embeds = process_imap_folder(
-                mail, folder_name, genre,
-                mark_as_read=mark_as_read,
-                include_read=include_read,
-                delete_after=delete_after,
-                config=config
-            )
-            embeds_by_genre[genre].extend(embeds)
+            jobs.append((folder_name, genre))
+
+        results = process_imap_folders(
+            session, jobs,
+            connections=args.imap_connections,
+            mark_as_read=mark_as_read,
+            include_read=include_read,
+            delete_after=delete_after,
+            config=config,
+            fetch_batch_size=args.fetch_batch_size,
+            store_batch_size=args.store_batch_size,
+            max_workers=args.workers,
+            search_from=args.search_from
+        )
+        for (folder_name, genre), embeds in zip(jobs, results):
+            # La lista de la primera carpeta de cada género se usa tal cual;
+            # solo se copian las de las carpetas siguientes del mismo género
+            genre_embeds = embeds_by_genre.setdefault(genre, embeds)
+            if genre_embeds is not embeds:
+                genre_embeds.extend(embeds)
 
         # Crear directorio de salida
         os.makedirs(args.output_dir, exist_ok=True)
 
         # Generar HTMLs por género
-        total_embeds = sum(len(embeds) for embeds in embeds_by_genre.values())
-        print(f"\n{'='*80}")
-        print(f"📊 RESUMEN")
-        print(f"{'='*80}")
-        print(f"Total de embeds encontrados: {total_embeds}")
-        print(f"Géneros: {len(embeds_by_genre)}")
+        total_embeds = sum(map(len, embeds_by_genre.values()))
+        print(f"""
+{'='*80}
+📊 RESUMEN
+{'='*80}
+Total de embeds encontrados: {total_embeds}
+Géneros: {len(embeds_by_genre)}""")
 
         if total_embeds > 0:
             print(f"\n📝 Generando archivos HTML...")
 
-            for genre, embeds in sorted(embeds_by_genre.items()):
-                if not embeds:
-                    continue
-
-                print(f"\n  Generando {genre}... ({len(embeds)} discos)")
-                filename = generate_genre_html_with_api(
-                    genre, embeds, args.output_dir, config, args.items_per_page
-                )
-                print(f"  Total: {len(embeds)} discos en {genre}")
-
-            print(f"\n{'='*80}")
-            print(f"✅ Archivos HTML generados en: {args.output_dir}")
-            print(f"{'='*80}\n")
-            print(f"📌 IMPORTANTE:")
-            print(f"   • Los archivos HTML incluyen botones de acción")
-            print(f"   • Para que funcionen, necesitas implementar un servidor API")
-            print(f"   • Ver documentación para configurar el backend")
-            print(f"\n🌐 Los archivos HTML están listos para visualizar")
-            print(f"📝 Ejecuta el generador de índice para crear index.html")
+            genre_items = [(genre, embeds) for genre, embeds in sorted(embeds_by_genre.items()) if embeds]
+            html_workers = min(args.html_workers, len(genre_items))
+
+            # Igual para todos los géneros: se serializa una vez. Con esto las
+            # páginas ya no necesitan config (ni su contraseña), que no se pasa
+            # a los procesos
+            metadata_json = imap_metadata_json(config)
+
+            if html_workers > 1:
+                # Cada género es independiente y su generación usa CPU: en
+                # procesos separados se reparten entre los núcleos (sin el GIL)
+                with ProcessPoolExecutor(max_workers=html_workers) as executor:
+                    futures = {}
+                    for genre, embeds in genre_items:
+                        print(f"\n  Generando {genre}... ({len(embeds)} discos)")
+                        future = executor.submit(
+                            generate_genre_html_with_api,
+                            genre, embeds, args.output_dir, None, args.items_per_page,
+                            metadata_json, args.gzip
+                        )
+                        futures[future] = (genre, embeds)
+
+                    for future in as_completed(futures):
+                        genre, embeds = futures[future]
+                        filename = future.result()
+                        print(f"  Total: {len(embeds)} discos en {genre}")
+            else:
+                for genre, embeds in genre_items:
+                    print(f"\n  Generando {genre}... ({len(embeds)} discos)")
+                    filename = generate_genre_html_with_api(
+                        genre, embeds, args.output_dir, None, args.items_per_page,
+                        metadata_json, args.gzip
+                    )
+                    print(f"  Total: {len(embeds)} discos en {genre}")
+
+            print(f"""
+{'='*80}
+✅ Archivos HTML generados en: {args.output_dir}
+{'='*80}
+
+📌 IMPORTANTE:
+   • Los archivos HTML incluyen botones de acción
+   • Para que funcionen, necesitas implementar un servidor API
+   • Ver documentación para configurar el backend
+
+🌐 Los archivos HTML están listos para visualizar
+📝 Ejecuta el generador de índice para crear index.html""")
         else:
             print("\n⚠ No se encontraron embeds de Bandcamp en los correos")
 
     finally:
+        save_embed_cache(args.embed_cache_file)
+
         # Mantener la sesión abierta (no cerrar automáticamente)
         print("\n✓ Sesión IMAP mantenida abierta para futuras operaciones")
 
@@ -11,150 +11,85 @@ import json
 from pathlib import Path
 from html import escape
 from collections import defaultdict
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from hashlib import blake2b
 
+# Un solo extractor para todos los scripts: las claves de localStorage
+# dependen de que den el mismo ID
+from bandcamp_id_extractor import extract_bandcamp_id
 
-def extract_bandcamp_id(embed_code):
-    """
-    Extrae el album_id o track_id del código embed de Bandcamp.
-    Ejemplo: album=1212060845 → "album_1212060845"
-    """
-    if not embed_code:
-        return None
-
-    # Buscar album=XXXXXXXX
-    album_match = re.search(r'album=(\d+)', embed_code)
-    if album_match:
-        return f"album_{album_match.group(1)}"
-
-    # Buscar track=XXXXXXXX
-    track_match = re.search(r'track=(\d+)', embed_code)
-    if track_match:
-        return f"track_{track_match.group(1)}"
-
-    return None
+# Caracteres que no pueden ir en el nombre de archivo ni en la clave de
+# localStorage de un género
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w\s-]')
 
+# src del iframe, para diferir la carga de los reproductores (data-src)
+_IFRAME_SRC_RE = re.compile(r'(<iframe\b[^>]*?\s)src=')
 
-def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
-    """
-    Genera un archivo HTML estático para un género específico.
-    USA ALBUM_ID DE BANDCAMP como identificador único.
-    """
-    # Ordenar embeds por fecha (más reciente primero)
-    embeds_sorted = sorted(
-        embeds,
-        key=lambda x: x.get('date_obj') or datetime.min,
-        reverse=True
-    )
-
-    # Sanitizar el nombre del archivo
-    safe_genre = re.sub(r'[^\w\s-]', '', genre).strip().replace(' ', '_')
-    filename = f"{safe_genre}.html"
-
-    total_items = len(embeds_sorted)
-    total_pages = (total_items + items_per_page - 1) // items_per_page
-
-    # Generar los embeds HTML con botón de "Escuchado"
-    embeds_html = ""
-    for i, embed_data in enumerate(embeds_sorted):
-        page_num = (i // items_per_page) + 1
-        page_class = f"page-{page_num}" if total_pages > 1 else ""
 
-        # CRÍTICO: Usar album_id de Bandcamp
-        embed_id = extract_bandcamp_id(embed_data['embed'])
-
-        if not embed_id:
-            # Fallback: usar índice si no se encuentra ID
-            embed_id = f"embed_{i}"
-            print(f"  ⚠️  No se encontró album_id para: {embed_data.get('subject', 'Sin título')[:50]}")
-
-        embeds_html += f"""
-        <div class="embed-item {page_class}" data-page="{page_num}" id="{embed_id}" data-embed-id="{embed_id}">
-            {embed_data['embed']}
-            <div class="embed-info">
-                <strong>{escape(embed_data.get('subject', 'Sin título'))}</strong><br>
-                <small>📅 {escape(embed_data.get('date', 'Fecha desconocida'))}</small>
-            </div>
-            <div class="embed-actions">
-                <button class="action-btn listened-btn" onclick="markAsListened('{embed_id}')">
-                    🎧 Marcar como escuchado
-                </button>
-            </div>
-        </div>
-        """
-
-    # Generar controles de paginación
-    pagination_html = ""
-    if total_pages > 1:
-        pagination_html = '<div class="pagination">'
-        for page in range(1, total_pages + 1):
-            active = "active" if page == 1 else ""
-            pagination_html += f'<button class="page-btn {active}" data-page="{page}">Página {page}</button>'
-        pagination_html += '</div>'
+# Búfer de escritura de las páginas: las escrituras pequeñas de cada embed
+# se agrupan en pocas llamadas al sistema
+PAGE_WRITE_BUFFER = 1 << 20
 
-    # HTML completo con localStorage usando album_id de Bandcamp
-    html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🎵 {escape(genre)} - Bandcamp Collection</title>
-    <link rel="icon" type="image/png" href="images/bandcamp.png">
-    <style>
-        * {{
+# Partes fijas de las páginas (iguales para todos los géneros): se definen
+# una vez y solo se interpolan los datos de cada página
+_GENRE_PAGE_STYLE = """    <style>
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
             background: linear-gradient(135deg, #14141e 0%, #2d1b4e 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
-        }}
+        }
 
-        header {{
+        header {
             background: rgba(30, 30, 45, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 20px;
             padding: 30px;
             margin-bottom: 30px;
             box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
-        }}
+        }
 
-        h1 {{
+        h1 {
             color: #e0e0e0;
             font-size: 2.5em;
             margin-bottom: 10px;
-        }}
+        }
 
-        .subtitle {{
+        .subtitle {
             color: #b0b0b0;
             font-size: 1.1em;
             margin-bottom: 15px;
-        }}
+        }
 
-        .back-link {{
+        .back-link {
             display: inline-block;
             margin-top: 15px;
             color: #9d7dff;
             text-decoration: none;
             font-weight: 500;
             transition: color 0.3s;
-        }}
+        }
 
-        .back-link:hover {{
+        .back-link:hover {
             color: #764ba2;
-        }}
+        }
 
-        .reset-btn {{
+        .reset-btn {
             display: inline-block;
             margin-left: 20px;
             padding: 8px 16px;
@@ -166,66 +101,66 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
             font-weight: 500;
             text-decoration: none;
             transition: all 0.3s;
-        }}
+        }
 
-        .reset-btn:hover {{
+        .reset-btn:hover {
             background: #da190b;
             transform: translateY(-2px);
-        }}
+        }
 
-        .stats {{
+        .stats {
             margin-top: 15px;
             padding: 15px;
             background: rgba(102, 126, 234, 0.1);
             border-radius: 10px;
             color: #e0e0e0;
-        }}
+        }
 
-        .embeds-grid {{
+        .embeds-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(400px, 1fr));
             gap: 25px;
             margin-bottom: 30px;
-        }}
+        }
 
-        .embed-item {{
+        .embed-item {
             background: rgba(30, 30, 45, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 15px;
             padding: 20px;
             box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
             transition: transform 0.3s, box-shadow 0.3s, opacity 0.3s;
-        }}
+        }
 
-        .embed-item:hover {{
+        .embed-item:hover {
             transform: translateY(-5px);
             box-shadow: 0 10px 30px rgba(0, 0, 0, 0.15);
-        }}
+        }
 
-        .embed-item.hidden {{
+        .embed-item.hidden {
             display: none;
-        }}
+        }
 
-        .embed-item.listened {{
+        .embed-item.listened {
             opacity: 0;
             transform: scale(0.8);
             pointer-events: none;
-        }}
+        }
 
-        .embed-info {{
+        .embed-info {
             margin-top: 15px;
             color: #c0c0c0;
             font-size: 0.9em;
-        }}
+        }
 
-        .embed-actions {{
+        .embed-actions {
             margin-top: 15px;
             display: flex;
             gap: 10px;
             flex-wrap: wrap;
-        }}
+        }
 
-        .action-btn {{
+        .action-btn {
             flex: 1;
             min-width: 150px;
             padding: 10px 15px;
@@ -235,33 +170,33 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
             font-weight: 500;
             font-size: 0.9em;
             transition: all 0.3s;
-        }}
+        }
 
-        .listened-btn {{
+        .listened-btn {
             background: #4CAF50;
             color: white;
-        }}
+        }
 
-        .listened-btn:hover {{
+        .listened-btn:hover {
             background: #45a049;
             transform: translateY(-2px);
-        }}
+        }
 
-        .listened-btn:disabled {{
+        .listened-btn:disabled {
             background: #ccc;
             cursor: not-allowed;
             transform: none;
-        }}
+        }
 
-        .pagination {{
+        .pagination {
             display: flex;
             justify-content: center;
             gap: 10px;
             flex-wrap: wrap;
             margin-top: 30px;
-        }}
+        }
 
-        .page-btn {{
+        .page-btn {
             background: rgba(30, 30, 45, 0.95);
             border: 2px solid #667eea;
             color: #9d7dff;
@@ -270,19 +205,19 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
             cursor: pointer;
             font-weight: 500;
             transition: all 0.3s;
-        }}
+        }
 
-        .page-btn:hover {{
+        .page-btn:hover {
             background: #667eea;
             color: white;
-        }}
+        }
 
-        .page-btn.active {{
+        .page-btn.active {
             background: #667eea;
             color: white;
-        }}
+        }
 
-        .notification {{
+        .notification {
             position: fixed;
             top: 20px;
             right: 20px;
@@ -293,105 +228,80 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
             z-index: 1000;
             display: none;
             animation: slideIn 0.3s ease;
-        }}
+        }
 
-        .notification.show {{
+        .notification.show {
             display: block;
-        }}
+        }
 
-        .notification.success {{
+        .notification.success {
             border-left: 4px solid #4CAF50;
-        }}
+        }
 
-        @keyframes slideIn {{
-            from {{
+        @keyframes slideIn {
+            from {
                 transform: translateX(400px);
                 opacity: 0;
-            }}
-            to {{
+            }
+            to {
                 transform: translateX(0);
                 opacity: 1;
-            }}
-        }}
+            }
+        }
 
-        @media (max-width: 768px) {{
-            .embeds-grid {{
+        @media (max-width: 768px) {
+            .embeds-grid {
                 grid-template-columns: 1fr;
-            }}
+            }
 
-            h1 {{
+            h1 {
                 font-size: 2em;
-            }}
+            }
 
-            .action-btn {{
+            .action-btn {
                 min-width: 100%;
-            }}
-        }}
+            }
+        }
     </style>
-</head>
-<body>
-    <div class="container">
-        <header>
-            <h1>🎵 {escape(genre)}</h1>
-            <p class="subtitle">💿 <span id="visible-count">{total_items}</span> de {total_items} disco{"s" if total_items != 1 else ""}</p>
-            <div class="stats">
-                <strong>📊 Estadísticas:</strong>
-                <div style="margin-top: 8px;">
-                    ✅ Escuchados: <span id="listened-count">0</span> |
-                    👂 Pendientes: <span id="pending-count">{total_items}</span>
-                </div>
-            </div>
-            <div style="margin-top: 15px;">
-                <a href="index.html" class="back-link">← Volver al índice</a>
-                <button class="reset-btn" onclick="resetListened()">🔄 Restaurar todos</button>
-            </div>
-        </header>
-
-        <div class="embeds-grid" id="embeds-container">
-            {embeds_html}
-        </div>
-
-        {pagination_html}
-    </div>
-
-    <div id="notification" class="notification"></div>
+"""
 
-    <script>
-        const STORAGE_KEY = 'bandcamp_listened_{safe_genre}';
-        const TOTAL_ITEMS = {total_items};
+_GENRE_PAGE_SCRIPT = """        // Índice embedId → tarjeta, construido una sola vez
+        const embedItems = document.querySelectorAll('.embed-item');
+        const EMBED_INDEX = new Map();
+        embedItems.forEach(item => EMBED_INDEX.set(item.dataset.embedId, item));
 
         // Cargar estado guardado al iniciar
-        function loadListenedState() {{
+        function loadListenedState() {
             const listened = JSON.parse(localStorage.getItem(STORAGE_KEY) || '[]');
             let hiddenCount = 0;
 
-            listened.forEach(embedId => {{
-                const element = document.querySelector(`[data-embed-id="${{embedId}}"]`);
-                if (element) {{
+            listened.forEach(embedId => {
+                const element = EMBED_INDEX.get(embedId);
+                if (element) {
                     element.classList.add('listened');
-                    setTimeout(() => {{
+                    setTimeout(() => {
                         element.style.display = 'none';
-                    }}, 500);
+                    }, 500);
                     hiddenCount++;
-                }}
-            }});
+                }
+            });
 
             updateStats(hiddenCount);
 
             console.log('💾 Loaded listened:', listened);
-        }}
+        }
 
         // Actualizar estadísticas
-        function updateStats(listenedCount) {{
+        function updateStats(listenedCount) {
             const pending = TOTAL_ITEMS - listenedCount;
             document.getElementById('listened-count').textContent = listenedCount;
             document.getElementById('pending-count').textContent = pending;
             document.getElementById('visible-count').textContent = pending;
-        }}
+        }
 
         // Marcar como escuchado
-        function markAsListened(embedId) {{
-            const element = document.getElementById(embedId);
+        function markAsListened(embedId) {
+            const element = EMBED_INDEX.get(embedId);
             const button = element.querySelector('.listened-btn');
 
             // Deshabilitar botón
@@ -399,91 +309,111 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
             button.textContent = '✅ Escuchado';
 
             // Guardar en localStorage
-            const listened = JSON.parse(localStorage.getItem(STORAGE_KEY) || '[]');
-            if (!listened.includes(embedId)) {{
-                listened.push(embedId);
-                localStorage.setItem(STORAGE_KEY, JSON.stringify(listened));
+            const listened = new Set(JSON.parse(localStorage.getItem(STORAGE_KEY) || '[]'));
+            if (!listened.has(embedId)) {
+                listened.add(embedId);
+                localStorage.setItem(STORAGE_KEY, JSON.stringify([...listened]));
                 console.log('✅ Marked as listened:', embedId);
-            }}
+            }
 
             // Animar desaparición
             element.classList.add('listened');
 
-            setTimeout(() => {{
+            setTimeout(() => {
                 element.style.display = 'none';
-                updateStats(listened.length);
-            }}, 500);
+                updateStats(listened.size);
+            }, 500);
 
             showNotification('¡Marcado como escuchado!', 'success');
-        }}
+        }
 
         // Resetear todos los escuchados
-        function resetListened() {{
-            if (!confirm('¿Restaurar todos los discos? Aparecerán de nuevo los que marcaste como escuchados.')) {{
+        function resetListened() {
+            if (!confirm('¿Restaurar todos los discos? Aparecerán de nuevo los que marcaste como escuchados.')) {
                 return;
-            }}
+            }
 
             localStorage.removeItem(STORAGE_KEY);
 
             // Mostrar todos los elementos
-            document.querySelectorAll('.embed-item').forEach(item => {{
+            embedItems.forEach(item => {
                 item.classList.remove('listened');
                 item.style.display = '';
                 const button = item.querySelector('.listened-btn');
                 button.disabled = false;
                 button.textContent = '🎧 Marcar como escuchado';
-            }});
+            });
 
             updateStats(0);
             showNotification('Todos los discos restaurados', 'success');
-        }}
+        }
 
         // Paginación
         const pageButtons = document.querySelectorAll('.page-btn');
-        const embedItems = document.querySelectorAll('.embed-item');
 
-        pageButtons.forEach(button => {{
-            button.addEventListener('click', () => {{
+        pageButtons.forEach(button => {
+            button.addEventListener('click', () => {
                 const page = button.dataset.page;
 
                 pageButtons.forEach(btn => btn.classList.remove('active'));
                 button.classList.add('active');
 
-                embedItems.forEach(item => {{
-                    if (item.classList.contains('listened')) {{
+                embedItems.forEach(item => {
+                    if (item.classList.contains('listened')) {
                         return;
-                    }}
+                    }
 
-                    if (item.dataset.page === page) {{
+                    if (item.dataset.page === page) {
                         item.classList.remove('hidden');
-                    }} else {{
+                    } else {
                         item.classList.add('hidden');
-                    }}
-                }});
+                    }
+                });
 
-                window.scrollTo({{ top: 0, behavior: 'smooth' }});
-            }});
-        }});
+                window.scrollTo({ top: 0, behavior: 'smooth' });
+            });
+        });
 
         // Mostrar solo la primera página al cargar
-        if (pageButtons.length > 0) {{
-            embedItems.forEach(item => {{
-                if (item.dataset.page !== '1' && !item.classList.contains('listened')) {{
+        if (pageButtons.length > 0) {
+            embedItems.forEach(item => {
+                if (item.dataset.page !== '1' && !item.classList.contains('listened')) {
                     item.classList.add('hidden');
-                }}
-            }});
-        }}
+                }
+            });
+        }
 
         // Notificaciones
-        function showNotification(message, type = 'success') {{
+        function showNotification(message, type = 'success') {
             const notification = document.getElementById('notification');
             notification.textContent = message;
-            notification.className = `notification show ${{type}}`;
+            notification.className = `notification show ${type}`;
 
-            setTimeout(() => {{
+            setTimeout(() => {
                 notification.classList.remove('show');
-            }}, 3000);
-        }}
+            }, 3000);
+        }
+
+        // Reproductores diferidos: se les pone el src al entrar en pantalla
+        const lazyIframes = document.querySelectorAll('iframe[data-src]');
+        if ('IntersectionObserver' in window) {
+            const iframeObserver = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        const iframe = entry.target;
+                        iframe.src = iframe.dataset.src;
+                        iframe.removeAttribute('data-src');
+                        iframeObserver.unobserve(iframe);
+                    }
+                });
+            }, { rootMargin: '200px' });
+            lazyIframes.forEach(iframe => iframeObserver.observe(iframe));
+        } else {
+            lazyIframes.forEach(iframe => {
+                iframe.src = iframe.dataset.src;
+                iframe.removeAttribute('data-src');
+            });
+        }
 
         // Cargar estado al iniciar la página
         loadListenedState();
@@ -491,84 +421,53 @@ def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
         console.log('🔑 Usando album_id/track_id de Bandcamp como identificador único');
         console.log('💾 Storage key:', STORAGE_KEY);
 
-        // Función para detener otros reproductores de Bandcamp
-        function stopOtherPlayers(currentIframe) {{
-            const allIframes = document.querySelectorAll('iframe[src*="bandcamp.com"]');
-            allIframes.forEach(iframe => {{
-                if (iframe !== currentIframe) {{
-                    const src = iframe.src;
-                    iframe.src = '';
-                    iframe.src = src;
-                }}
-            }});
-        }}
+        // Reproductor activo: solo puede sonar uno, así que al cambiar de
+        // tarjeta basta con recargar ese (no todos los iframes de la página)
+        let activeIframe = null;
+
+        // Función para detener el reproductor de Bandcamp anterior
+        function stopOtherPlayers(currentIframe) {
+            if (activeIframe && activeIframe !== currentIframe) {
+                const src = activeIframe.src;
+                activeIframe.src = '';
+                activeIframe.src = src;
+            }
+            activeIframe = currentIframe;
+        }
 
         // Detectar cuando se reproduce un embed
-        document.querySelectorAll('.embed-item').forEach(embedItem => {{
-            embedItem.addEventListener('click', (e) => {{
+        embedItems.forEach(embedItem => {
+            embedItem.addEventListener('click', (e) => {
                 const iframe = embedItem.querySelector('iframe[src*="bandcamp.com"]');
-                if (iframe && !e.target.classList.contains('action-btn')) {{
-                    setTimeout(() => {{
+                if (iframe && !e.target.classList.contains('action-btn')) {
+                    setTimeout(() => {
                         stopOtherPlayers(iframe);
-                    }}, 100);
-                }}
-            }});
-        }});
-    </script>
-</body>
-</html>
+                    }, 100);
+                }
+            });
+        });
 """
 
-    filepath = os.path.join(output_dir, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html)
-
-    return filename
-
-
-def generate_index_html(genres_data, output_dir):
-    """
-    Genera un index.html con enlaces a todos los géneros.
-    """
-    genres_html = ""
-    total_albums = sum(data['count'] for data in genres_data.values())
-
-    for genre, data in sorted(genres_data.items()):
-        genres_html += f"""
-        <div class="genre-card">
-            <a href="{data['filename']}" class="genre-link">
-                <h2>🎵 {escape(genre)}</h2>
-                <p class="count">💿 {data['count']} disco{"s" if data['count'] != 1 else ""}</p>
-            </a>
-        </div>
-        """
-
-    html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🎵 Mi Colección de Bandcamp</title>
-    <style>
-        * {{
+_INDEX_PAGE_STYLE = """    <style>
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
             background: linear-gradient(135deg, #14141e 0%, #2d1b4e 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
-        }}
+        }
 
-        header {{
+        header {
             background: rgba(30, 30, 45, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 20px;
@@ -576,57 +475,57 @@ def generate_index_html(genres_data, output_dir):
             margin-bottom: 30px;
             box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
             text-align: center;
-        }}
+        }
 
-        h1 {{
+        h1 {
             color: #e0e0e0;
             font-size: 3em;
             margin-bottom: 10px;
-        }}
+        }
 
-        .subtitle {{
+        .subtitle {
             color: #b0b0b0;
             font-size: 1.2em;
-        }}
+        }
 
-        .genres-grid {{
+        .genres-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(280px, 1fr));
             gap: 20px;
-        }}
+        }
 
-        .genre-card {{
+        .genre-card {
             background: rgba(30, 30, 45, 0.95);
             backdrop-filter: blur(10px);
             border-radius: 15px;
             padding: 30px;
             box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
             transition: transform 0.3s, box-shadow 0.3s;
-        }}
+        }
 
-        .genre-card:hover {{
+        .genre-card:hover {
             transform: translateY(-5px);
             box-shadow: 0 10px 30px rgba(0, 0, 0, 0.15);
-        }}
+        }
 
-        .genre-link {{
+        .genre-link {
             text-decoration: none;
             color: inherit;
             display: block;
-        }}
+        }
 
-        .genre-card h2 {{
+        .genre-card h2 {
             color: #9d7dff;
             margin-bottom: 10px;
             font-size: 1.5em;
-        }}
+        }
 
-        .count {{
+        .count {
             color: #b0b0b0;
             font-size: 1.1em;
-        }}
+        }
 
-        .tools-link {{
+        .tools-link {
             display: inline-block;
             margin-top: 20px;
             padding: 12px 24px;
@@ -637,32 +536,216 @@ def generate_index_html(genres_data, output_dir):
             font-weight: 500;
             transition: all 0.3s;
             box-shadow: 0 4px 15px rgba(157, 125, 255, 0.3);
-        }}
+        }
 
-        .tools-link:hover {{
+        .tools-link:hover {
             background: linear-gradient(135deg, #b99dff 0%, #9d7dff 100%);
             transform: translateY(-2px);
             box-shadow: 0 6px 20px rgba(157, 125, 255, 0.4);
-        }}
+        }
 
-        footer {{
+        footer {
             margin-top: 40px;
             text-align: center;
             color: rgba(255, 255, 255, 0.8);
             font-size: 0.9em;
-        }}
+        }
 
-        @media (max-width: 768px) {{
-            h1 {{
+        @media (max-width: 768px) {
+            h1 {
                 font-size: 2em;
-            }}
+            }
 
-            .genres-grid {{
+            .genres-grid {
                 grid-template-columns: 1fr;
-            }}
-        }}
+            }
+        }
     </style>
-</head>
+"""
+
+
+# Fecha para los embeds sin fecha o con fecha ilegible (con zona horaria, para
+# poder ordenarla junto a las demás)
+_MIN_DATE = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def parse_embed_date(date_str, cache):
+    """
+    Convierte la fecha RFC 2822 del correo en datetime con zona horaria.
+    Muchos correos comparten la misma cadena de fecha: cada una se parsea una
+    sola vez y se guarda en cache (dict compartido entre géneros).
+    """
+    date_obj = cache.get(date_str)
+    if date_obj is None:
+        try:
+            date_obj = parsedate_to_datetime(date_str)
+            if date_obj.tzinfo is None:
+                date_obj = date_obj.replace(tzinfo=timezone.utc)
+        except Exception:
+            date_obj = _MIN_DATE
+        cache[date_str] = date_obj
+    return date_obj
+
+
+def deduplicate_embeds(embeds):
+    """
+    Quita los embeds repetidos (misma URL: el mismo disco anunciado en varios
+    correos) conservando el primero. Una sola pasada con un dict, que mantiene
+    el orden de inserción; los que no tienen URL se conservan todos.
+    """
+    unique = {}
+    for embed in embeds:
+        unique.setdefault(embed.get('url') or id(embed), embed)
+    return list(unique.values())
+
+
+def generate_static_genre_html(genre, embeds, output_dir, items_per_page=10):
+    """
+    Genera un archivo HTML estático para un género específico.
+    USA ALBUM_ID DE BANDCAMP como identificador único.
+    Los embeds deben llegar ya ordenados por fecha (más reciente primero).
+    """
+    # Sanitizar el nombre del archivo
+    safe_genre = _UNSAFE_FILENAME_RE.sub('', genre).strip().replace(' ', '_')
+    filename = f"{safe_genre}.html"
+
+    total_items = len(embeds)
+    total_pages = (total_items + items_per_page - 1) // items_per_page
+
+    # Escapado una vez para el <title> y el <h1>
+    genre_html = escape(genre)
+
+    # Generar controles de paginación
+    pagination_html = ""
+    if total_pages > 1:
+        pagination_html = '<div class="pagination">' + ''.join(
+            f'<button class="page-btn {"active" if page == 1 else ""}" data-page="{page}">Página {page}</button>'
+            for page in range(1, total_pages + 1)
+        ) + '</div>'
+
+    # HTML con localStorage usando album_id de Bandcamp, escrito en el archivo
+    # a medida que se genera (sin construir el documento completo en memoria)
+    filepath = os.path.join(output_dir, filename)
+    with open(filepath, 'w', encoding='utf-8', buffering=PAGE_WRITE_BUFFER) as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🎵 {genre_html} - Bandcamp Collection</title>
+    <link rel="icon" type="image/png" href="images/bandcamp.png">
+{_GENRE_PAGE_STYLE}</head>
+<body>
+    <div class="container">
+        <header>
+            <h1>🎵 {genre_html}</h1>
+            <p class="subtitle">💿 <span id="visible-count">{total_items}</span> de {total_items} disco{"s" if total_items != 1 else ""}</p>
+            <div class="stats">
+                <strong>📊 Estadísticas:</strong>
+                <div style="margin-top: 8px;">
+                    ✅ Escuchados: <span id="listened-count">0</span> |
+                    👂 Pendientes: <span id="pending-count">{total_items}</span>
+                </div>
+            </div>
+            <div style="margin-top: 15px;">
+                <a href="index.html" class="back-link">← Volver al índice</a>
+                <button class="reset-btn" onclick="resetListened()">🔄 Restaurar todos</button>
+            </div>
+        </header>
+
+        <div class="embeds-grid" id="embeds-container">
+            """)
+
+        # Embeds con botón de "Escuchado", escritos uno a uno
+        for i, embed_data in enumerate(embeds):
+            page_num = (i // items_per_page) + 1
+            page_class = f"page-{page_num}" if total_pages > 1 else ""
+
+            embed_html = embed_data['embed']
+            subject = embed_data.get('subject', 'Sin título')
+
+            # CRÍTICO: Usar album_id de Bandcamp
+            embed_id = extract_bandcamp_id(embed_html)
+
+            if not embed_id:
+                # Fallback: hash de la URL, estable entre regeneraciones (el índice
+                # cambia al llegar discos nuevos y localStorage dejaría de coincidir)
+                url = embed_data.get('url')
+                if url:
+                    embed_id = f"embed_{blake2b(url.encode('utf-8'), digest_size=6).hexdigest()}"
+                else:
+                    embed_id = f"embed_{i}"
+                print(f"  ⚠️  No se encontró album_id para: {subject[:50]}")
+
+            # Carga diferida: el navegador solo abre los reproductores visibles.
+            # Los de otras páginas (ocultos con display:none, que loading="lazy"
+            # no siempre difiere) llevan data-src y el JS les pone el src al verse
+            if 'loading=' not in embed_html:
+                embed_html = embed_html.replace('<iframe ', '<iframe loading="lazy" ', 1)
+            if page_num > 1:
+                embed_html = _IFRAME_SRC_RE.sub(r'\1data-src=', embed_html, count=1)
+
+            f.write(f"""
+        <div class="embed-item {page_class}" data-page="{page_num}" id="{embed_id}" data-embed-id="{embed_id}">
+            {embed_html}
+            <div class="embed-info">
+                <strong>{escape(subject)}</strong><br>
+                <small>📅 {escape(embed_data.get('date', 'Fecha desconocida'))}</small>
+            </div>
+            <div class="embed-actions">
+                <button class="action-btn listened-btn" onclick="markAsListened('{embed_id}')">
+                    🎧 Marcar como escuchado
+                </button>
+            </div>
+        </div>
+        """)
+
+        f.write(f"""
+        </div>
+
+        {pagination_html}
+    </div>
+
+    <div id="notification" class="notification"></div>
+
+    <script>
+        const STORAGE_KEY = 'bandcamp_listened_{safe_genre}';
+        const TOTAL_ITEMS = {total_items};
+
+{_GENRE_PAGE_SCRIPT}    </script>
+</body>
+</html>
+""")
+
+    return filename
+
+
+def generate_index_html(genres_data, output_dir):
+    """
+    Genera un index.html con enlaces a todos los géneros.
+    """
+    total_albums = sum(data['count'] for data in genres_data.values())
+
+    genre_parts = []
+    for genre, data in sorted(genres_data.items()):
+        genre_parts.append(f"""
+        <div class="genre-card">
+            <a href="{data['filename']}" class="genre-link">
+                <h2>🎵 {escape(genre)}</h2>
+                <p class="count">💿 {data['count']} disco{"s" if data['count'] != 1 else ""}</p>
+            </a>
+        </div>
+        """)
+
+    genres_html = ''.join(genre_parts)
+
+    html = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🎵 Mi Colección de Bandcamp</title>
+{_INDEX_PAGE_STYLE}</head>
 <body>
     <div class="container">
         <header>
@@ -706,6 +789,9 @@ def main():
                        help='Directorio de salida (default: docs para GitHub Pages)')
     parser.add_argument('--items-per-page', type=int, default=10,
                        help='Número de discos por página (default: 10)')
+    parser.add_argument('--html-workers', type=int, default=1,
+                       help='Procesos para generar los HTML de varios géneros a la vez; '
+                            'solo compensa con muchos géneros grandes (default: 1)')
 
     args = parser.parse_args()
 
@@ -731,20 +817,18 @@ def main():
 
     # Organizar por género
     embeds_by_genre = {}
+    date_cache = {}
     for genre, embeds in data.items():
         # Convertir fechas string a objetos datetime para ordenar
         for embed in embeds:
-            if 'date' in embed and embed['date']:
-                try:
-                    embed['date_obj'] = datetime.strptime(
-                        embed['date'],
-                        "%a, %d %b %Y %H:%M:%S %z"
-                    )
-                except:
-                    embed['date_obj'] = datetime.min
-            else:
-                embed['date_obj'] = datetime.min
+            date_str = embed.get('date')
+            embed['date_obj'] = parse_embed_date(date_str, date_cache) if date_str else _MIN_DATE
 
+        # Un disco repetido generaría dos tarjetas con el mismo id
+        embeds = deduplicate_embeds(embeds)
+
+        # Ordenar por fecha (más reciente primero) una sola vez, en su sitio
+        embeds.sort(key=itemgetter('date_obj'), reverse=True)
         embeds_by_genre[genre] = embeds
 
     # Generar HTMLs por género
@@ -754,19 +838,39 @@ def main():
     print(f"📊 Total de embeds: {total_embeds}")
     print(f"🎸 Géneros: {len(embeds_by_genre)}\n")
 
-    for genre, embeds in sorted(embeds_by_genre.items()):
-        if not embeds:
-            continue
-
-        print(f"  Generando {genre}... ({len(embeds)} discos)")
-        filename = generate_static_genre_html(
-            genre, embeds, args.output_dir, args.items_per_page
-        )
-
-        genres_data[genre] = {
-            'filename': filename,
-            'count': len(embeds)
-        }
+    genre_items = [(genre, embeds) for genre, embeds in sorted(embeds_by_genre.items()) if embeds]
+    html_workers = min(args.html_workers, len(genre_items))
+
+    if html_workers > 1:
+        # Cada género es independiente y su generación usa CPU: en procesos
+        # separados se reparten entre los núcleos (sin el GIL)
+        with ProcessPoolExecutor(max_workers=html_workers) as executor:
+            futures = {}
+            for genre, embeds in genre_items:
+                print(f"  Generando {genre}... ({len(embeds)} discos)")
+                future = executor.submit(
+                    generate_static_genre_html,
+                    genre, embeds, args.output_dir, args.items_per_page
+                )
+                futures[future] = (genre, embeds)
+
+            for future in as_completed(futures):
+                genre, embeds = futures[future]
+                genres_data[genre] = {
+                    'filename': future.result(),
+                    'count': len(embeds)
+                }
+    else:
+        for genre, embeds in genre_items:
+            print(f"  Generando {genre}... ({len(embeds)} discos)")
+            filename = generate_static_genre_html(
+                genre, embeds, args.output_dir, args.items_per_page
+            )
+
+            genres_data[genre] = {
+                'filename': filename,
+                'count': len(embeds)
+            }
 
     # Generar index.html
     print(f"\n  Generando index.html...")
@@ -10,25 +10,9 @@ import os
 import re
 from datetime import datetime
 
-
-def extract_bandcamp_id(embed_code):
-    """
-    Extrae el album_id o track_id del código embed de Bandcamp.
-    """
-    if not embed_code:
-        return None
-
-    # Buscar album=XXXXXXXX
-    album_match = re.search(r'album=(\d+)', embed_code)
-    if album_match:
-        return f"album_{album_match.group(1)}"
-
-    # Buscar track=XXXXXXXX
-    track_match = re.search(r'track=(\d+)', embed_code)
-    if track_match:
-        return f"track_{track_match.group(1)}"
-
-    return None
+# El mismo extractor que el generador estático: las claves de localStorage
+# dependen de que den el mismo ID
+from bandcamp_id_extractor import extract_bandcamp_id
 
 
 def sanitize_genre_name(genre):